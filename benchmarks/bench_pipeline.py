@@ -0,0 +1,176 @@
+"""pipeline benchmark
+==================
+generates a synthetic directory tree and times each phase of a spasco run
+separately: walk, filter, plan (incl. the depth scheduling), conflict check,
+preview and rename. The results are written as JSON, so runs of different
+versions can be compared.
+
+    python benchmarks/bench_pipeline.py --depth 4 --fanout 8 --files 20 -o result.json
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from spasco.executor import execute_plan  # noqa: E402
+from spasco.filters import build_filter_pipeline  # noqa: E402
+from spasco.main import __version__, recurse_dirs_and_files  # noqa: E402
+from spasco.planner import RenamePlan, rename_ops  # noqa: E402
+from spasco.preview import render_preview  # noqa: E402
+from spasco.rules import RuleSet  # noqa: E402
+
+PHASES = ('walk', 'filter', 'plan', 'conflicts', 'preview', 'rename')
+SEARCH_VALUE = ' '
+NEW_VALUE = '_'
+
+
+def make_tree(base: str, depth: int, fanout: int, files: int, match_share: float,
+              name_length: int, seed: int = 0) -> int:
+    """ creates fanout dirs per level down to depth and files files in every dir.
+    A share of match_share names contains the search-value.
+
+    :returns
+      number of created files/dirs
+    """
+    rng = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+    def name(index: int) -> str:
+        stem = ''.join(rng.choice(alphabet) for _ in range(max(name_length - 6, 1)))
+        if rng.random() < match_share:
+            middle = len(stem) // 2
+            stem = stem[:middle] + SEARCH_VALUE + stem[middle + 1:]
+        return f'{stem}{index:06d}'
+
+    count = 0
+    level = [base]
+    for current_depth in range(depth + 1):
+        next_level = []
+        for dir_path in level:
+            for i in range(files):
+                open(os.path.join(dir_path, name(i)), 'w').close()
+                count += 1
+            if current_depth < depth:
+                for i in range(fanout):
+                    sub_dir = os.path.join(dir_path, name(i))
+                    os.mkdir(sub_dir)
+                    next_level.append(sub_dir)
+                    count += 1
+        level = next_level
+    return count
+
+
+def run_phases(root: str, jobs: int = 1) -> Dict[str, float]:
+    """ runs each phase on the result of the previous one and returns their wall
+    times in seconds. The entries are materialized between the phases, so the
+    phases are timed independently of each other. """
+    rules = RuleSet([(SEARCH_VALUE, NEW_VALUE)])
+    times = {}
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        entries = _timed(times, 'walk', lambda: list(recurse_dirs_and_files(jobs=jobs)))
+        pipeline = build_filter_pipeline(search_value=SEARCH_VALUE, rules=rules)
+        matched = _timed(times, 'filter', lambda: list(pipeline.run(entries)))
+        plan = _timed(times, 'plan', lambda: RenamePlan(rename_ops(matched, rules)))
+        _timed(times, 'conflicts', plan.conflicts)
+        _timed(times, 'preview', lambda: render_preview(plan, stream=io.StringIO()))
+        failed = _timed(times, 'rename', lambda: sum(1 for result in execute_plan(plan, jobs=jobs) if result.error))
+    finally:
+        os.chdir(cwd)
+    if failed:
+        raise RuntimeError(f'{failed} renamings failed')
+    times['entries'] = len(entries)
+    times['renamed'] = len(plan)
+    return times
+
+
+def _timed(times: Dict[str, float], phase: str, func: Callable):
+    start = time.perf_counter()
+    result = func()
+    times[phase] = time.perf_counter() - start
+    return result
+
+
+def benchmark(depth: int = 3, fanout: int = 8, files: int = 20, match_share: float = 0.3, name_length: int = 16,
+              repeat: int = 3, jobs: int = 1, base_dir: Optional[str] = None) -> dict:
+    """ times all phases repeat times, each time on a freshly generated tree.
+
+    :returns
+      JSON-serializable dict with the parameters, the environment and for each
+      phase the best and all timings
+    """
+    runs: List[Dict[str, float]] = []
+    entries = 0
+    for i in range(repeat):
+        root = tempfile.mkdtemp(prefix='spasco-bench-', dir=base_dir)
+        try:
+            entries = make_tree(root, depth, fanout, files, match_share, name_length, seed=i)
+            runs.append(run_phases(root, jobs=jobs))
+        finally:
+            shutil.rmtree(root)
+    return {
+        'spasco': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': dict(depth=depth, fanout=fanout, files=files, match_share=match_share,
+                       name_length=name_length, repeat=repeat, jobs=jobs),
+        'entries': entries,
+        'renamed': runs[-1]['renamed'] if runs else 0,
+        'phases': {phase: {'best': min(run[phase] for run in runs), 'runs': [run[phase] for run in runs]}
+                   for phase in PHASES} if runs else {},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Times each phase of a spasco run on a synthetic tree.')
+    parser.add_argument('--depth', type=int, default=3, help='levels of subdirectories. Default: 3')
+    parser.add_argument('--fanout', type=int, default=8, help='subdirectories per dir. Default: 8')
+    parser.add_argument('--files', type=int, default=20, help='files per dir. Default: 20')
+    parser.add_argument('--match-share', type=float, default=0.3,
+                        help='share of the names containing the search-value. Default: 0.3')
+    parser.add_argument('--name-length', type=int, default=16, help='length of the names. Default: 16')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the best one counts. Default: 3')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='threads for walking and renaming. Default: 1')
+    default_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    parser.add_argument('--dir', default=default_dir,
+                        help='where the trees are generated. Default: /dev/shm (tmpfs) if present, else the temp dir')
+    parser.add_argument('-o', '--output', help='JSON file for the results. Default: stdout')
+    parser.add_argument('--baseline', help='JSON file of an earlier run, the phases are compared with it')
+    args = parser.parse_args(argv)
+
+    result = benchmark(depth=args.depth, fanout=args.fanout, files=args.files, match_share=args.match_share,
+                       name_length=args.name_length, repeat=args.repeat, jobs=args.jobs, base_dir=args.dir)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(result, fp, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['phases']
+    sys.stderr.write(f"{result['entries']} entries, {result['renamed']} renamed\n")
+    for phase, timing in result['phases'].items():
+        line = f"  {phase:<10} {timing['best'] * 1000:10.1f} ms"
+        if phase in baseline and baseline[phase]['best']:
+            line += f"  ({timing['best'] / baseline[phase]['best']:.2f}x of baseline)"
+        sys.stderr.write(line + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
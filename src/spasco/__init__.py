@@ -0,0 +1,11 @@
+"""spasco
+======
+command line tool and library for replacing spaces within file and directory
+names, see spasco.api for using it from Python
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+from .api import ConflictError, Filters, aapply, aiterate, aplan, apply, plan
+from .planner import Conflict, RenameOp, RenamePlan
+from .rules import RegexRule, RuleSet
@@ -0,0 +1,134 @@
+"""library api
+===========
+plans and renames within the calling process, without parsing argv, printing
+or prompting:
+
+    import spasco
+
+    rename_plan = spasco.plan(['incoming'], rules=[(' ', '_'), ('&', 'and')])
+    for result in spasco.apply(rename_plan):
+        if result.error is not None:
+            ...
+
+apply() yields the results while renaming, the next bucket of ops is only
+renamed when the results are consumed. aapply() does the same for asyncio.
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, \
+    TypeVar, Union
+
+from .filters import build_filter_pipeline
+from .main import recurse_dirs_and_files
+from .matcher import GlobMatcher
+from .planner import Conflict, RenamePlan, rename_ops
+from .rules import RegexRule, RuleSet
+from .walker import PathEntry, walk
+
+if TYPE_CHECKING:
+    from .executor import RenameResult
+
+T = TypeVar('T')
+
+Rules = Union[RuleSet, RegexRule, Iterable[Tuple[str, str]]]
+
+
+class Filters(NamedTuple):
+    """ the filters of the command line, see build_filter_pipeline(). Names are
+    always filtered by the search-values of the rules as well. """
+    pattern_only: Optional[Sequence[str]] = None
+    except_pattern: Optional[Sequence[str]] = None
+    dirs_only: bool = False
+    files_only: bool = False
+
+
+class ConflictError(Exception):
+    """ the plan contains renamings which would overwrite something. """
+
+    def __init__(self, conflicts: List[Conflict]):
+        super().__init__(f'{len(conflicts)} conflicts found, nothing was renamed')
+        self.conflicts = conflicts
+
+
+def plan(roots: Optional[Sequence[str]] = None, rules: Rules = ((' ', '_'),), filters: Optional[Filters] = None,
+         recursive: bool = True, prune: Optional[Sequence[str]] = None, max_depth: Optional[int] = None,
+         one_file_system: bool = False, jobs: int = 1) -> RenamePlan:
+    """ walks the roots and plans the renaming of all matching files/dirs.
+
+    :argument
+      roots (optional): files/dirs to start from, default is the cwd's content
+      rules: RuleSet, RegexRule or (search-value, new-value) pairs applied in one pass
+      filters (optional): Filters narrowing down the files/dirs
+      recursive: recurse into the dirs, otherwise only the roots are renamed
+      prune/max_depth/one_file_system/jobs: see recurse_dirs_and_files()
+
+    :returns
+      RenamePlan, a sequence of RenameOp objects ordered deepest first
+    """
+    rules = _rule_set(rules)
+    if recursive:
+        entries = recurse_dirs_and_files(roots=roots, prune=GlobMatcher(prune) if prune else None,
+                                         max_depth=max_depth, one_file_system=one_file_system, jobs=jobs)
+    else:
+        entries = (PathEntry.from_path(path) for path in roots) if roots else walk(max_depth=1)
+    pipeline = build_filter_pipeline(search_value=rules.rules[0][0], rules=rules, **(filters or Filters())._asdict())
+    return RenamePlan(rename_ops(pipeline.run(entries), rules))
+
+
+def apply(rename_plan: RenamePlan, jobs: int = 1, journal: Optional[str] = None) -> Iterator['RenameResult']:
+    """ renames the files/dirs of a plan, existing targets are never replaced.
+
+    :argument
+      journal (optional): path of a write-ahead journal recording the renamings,
+            see the undo and resume sub-commands
+
+    :returns
+      generator of RenameResult objects (op, error), error is None if the op succeeded
+
+    :raises
+      ConflictError: when the generator is started and the plan has conflicts
+    """
+    from .executor import execute_plan
+    from .journal import Journal, run_journal
+    conflicts = rename_plan.conflicts()
+    if conflicts:
+        raise ConflictError(conflicts)
+    if journal:
+        with Journal.create(journal, rename_plan) as opened_journal:
+            yield from run_journal(opened_journal, jobs=jobs)
+    else:
+        yield from execute_plan(rename_plan, jobs=jobs)
+
+
+async def aplan(*args, **kwargs) -> RenamePlan:
+    """ plan() running in the default executor of the event loop. """
+    import asyncio
+    import functools
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(plan, *args, **kwargs))
+
+
+async def aapply(rename_plan: RenamePlan, jobs: int = 1, journal: Optional[str] = None) -> AsyncIterator['RenameResult']:
+    """ apply() as an async generator, see aiterate(). """
+    async for result in aiterate(apply(rename_plan, jobs=jobs, journal=journal)):
+        yield result
+
+
+async def aiterate(items: Iterator[T]) -> AsyncIterator[T]:
+    """ pulls the items of a blocking generator in the default executor of the event
+    loop, one at a time when the consumer asks for it, so the generator never runs
+    ahead of the consumer. """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    done = object()
+    while True:
+        item = await loop.run_in_executor(None, next, items, done)
+        if item is done:
+            return
+        yield item
+
+
+def _rule_set(rules: Rules) -> Union[RuleSet, RegexRule]:
+    if isinstance(rules, (RuleSet, RegexRule)):
+        return rules
+    return RuleSet(list(rules))
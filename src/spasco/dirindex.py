@@ -0,0 +1,141 @@
+"""directory index
+===============
+persistent cache of directory listings, so repeated walks over a mostly unchanged
+tree only re-read directories whose mtime changed
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import marshal
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .syscalls import syscalls
+
+VERSION = 1
+# file type bits of the listed entries
+DIR = 1
+FILE = 2
+SYMLINK = 4
+# listings of directories modified less than this many seconds before they were
+# read aren't cached: a later change within the same mtime tick would go unnoticed
+MTIME_GRANULARITY = 2.0
+
+# file layout (marshal): (VERSION, {absolute dir path: (mtime_ns, names, kinds)})
+# names is a tuple of the entry names, kinds a bytes object of their file type bits.
+
+Listing = List[Tuple[str, int]]
+
+
+class DirIndex:
+    """ directory listings keyed by the absolute path of the directory. A cached
+    listing is reused as long as the mtime of its directory is unchanged, so an
+    unchanged directory costs one stat call instead of reading it. """
+
+    def __init__(self, dirs: Optional[Dict[str, Tuple[int, tuple, bytes]]] = None):
+        self._dirs = dirs if dirs is not None else {}
+        self._visited: Set[str] = set()
+        cwd = os.getcwd()
+        self._cwd = cwd
+        self._prefix = cwd.rstrip('/') + '/'
+        self._started = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._dirs)
+
+    @classmethod
+    def load(cls, path: str) -> 'DirIndex':
+        """ reads an index file, a missing or unreadable file gives an empty index. """
+        try:
+            with open(path, 'rb') as fp:
+                version, dirs = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            return cls()
+        if version != VERSION or not isinstance(dirs, dict):
+            return cls()
+        return cls(dirs)
+
+    def save(self, path: str) -> None:
+        """ writes the index atomically. Listings of directories which weren't visited
+        although their parent was (removed, renamed or pruned dirs) are dropped, the
+        ones of other trees are kept.
+
+        :raises
+          OSError: the index file can't be written, e.g. in a read-only dir
+        """
+        visited = self._visited
+        dirs = {key: value for key, value in self._dirs.items()
+                if key in visited or key[:key.rfind('/')] not in visited}
+        fd, tmp_path = tempfile.mkstemp(prefix='.dirindex-', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                marshal.dump((VERSION, dirs), fp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def listdir(self, path: str, dev: Optional[int] = None) -> Optional[Listing]:
+        """ the names and file type bits of the entries of a directory, taken from
+        the index if the directory is unchanged.
+
+        :argument
+          path: relative or absolute path of the directory
+          dev (optional): None is returned if the directory is on another device
+
+        :returns
+          list of (name, kind) tuples, None if the directory can't be read
+        """
+        syscalls.add('stat')
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if dev is not None and st.st_dev != dev:
+            return None
+        key = self._key(path)
+        self._visited.add(key)
+        cached = self._dirs.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            self.hits += 1
+            return list(zip(cached[1], cached[2]))
+        self.misses += 1
+        listing = read_dir(path)
+        if listing is None:
+            self._dirs.pop(key, None)
+            return None
+        if st.st_mtime < self._started - MTIME_GRANULARITY:
+            self._dirs[key] = (st.st_mtime_ns, tuple(name for name, _ in listing),
+                               bytes(kind for _, kind in listing))
+        else:
+            self._dirs.pop(key, None)
+        return listing
+
+    def _key(self, path: str) -> str:
+        path = path.rstrip('/') or '/'
+        if path.startswith('/'):
+            return path
+        return self._cwd if path == '.' else self._prefix + path
+
+
+def read_dir(path: str) -> Optional[Listing]:
+    """ lists a directory with the file type bits taken from os.scandir. """
+    syscalls.add('scandir')
+    try:
+        scanner = os.scandir(path)
+    except OSError:
+        return None
+    listing = []
+    with scanner:
+        for dir_entry in scanner:
+            try:
+                kind = ((SYMLINK if dir_entry.is_symlink() else 0) | (DIR if dir_entry.is_dir() else 0)
+                        | (FILE if dir_entry.is_file() else 0))
+            except OSError:
+                kind = 0
+            listing.append((dir_entry.name, kind))
+    return listing
@@ -0,0 +1,139 @@
+"""rename executor
+===============
+executes a rename plan bucket by bucket, concurrently within a bucket
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import ctypes
+import errno
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .planner import RenameOp, RenamePlan
+from .syscalls import syscalls
+
+# flag of renameat2(2): fail with EEXIST instead of replacing the target
+RENAME_NOREPLACE = 1
+_AT_FDCWD = -100
+# number of ops of one directory handled by a single task
+CHUNK_SIZE = 256
+
+_renameat2 = None
+
+
+class RenameResult(NamedTuple):
+    """ outcome of a single renaming, error is None if it succeeded. """
+    op: RenameOp
+    error: Optional[OSError] = None
+
+
+def execute_plan(plan: RenamePlan, jobs: int = 1) -> Iterator[RenameResult]:
+    """ renames all files/dirs of the plan, deepest first. The ops of each depth bucket
+    are grouped by their parent dir, which is opened once, and renamed relative to
+    its file descriptor. With jobs > 1 the groups of a bucket are renamed by a pool
+    of threads. Existing targets are never replaced.
+
+    :argument
+      plan: RenamePlan, should be checked for conflicts before
+      jobs: number of threads renaming concurrently
+
+    :returns
+      generator of RenameResult objects, one per op
+    """
+    for results in execute_batches((ops for _, ops in plan.depth_buckets()), jobs=jobs):
+        yield from results
+
+
+def execute_batches(batches: Iterable[List[RenameOp]], jobs: int = 1) -> Iterator[List[RenameResult]]:
+    """ executes batches of independent ops (e.g. the depth buckets of a plan) one
+    after another, see execute_plan().
+
+    :returns
+      generator of lists of RenameResult objects, one list per batch
+    """
+    if jobs <= 1:
+        for ops in batches:
+            yield [result for parent, chunk in _group_by_parent(ops) for result in _rename_in_dir(parent, chunk)]
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for ops in batches:
+            # a batch has to be finished before the parents are renamed in the next one
+            groups = pool.map(lambda group: _rename_in_dir(*group), _group_by_parent(ops))
+            yield [result for results in groups for result in results]
+
+
+def _group_by_parent(ops: List[RenameOp]) -> List[Tuple[str, List[RenameOp]]]:
+    groups: Dict[str, List[RenameOp]] = {}
+    for op in ops:
+        parent = op.src[:op.src.rfind('/') + 1]
+        groups.setdefault(parent, []).append(op)
+    return [(parent, group[i:i + CHUNK_SIZE])
+            for parent, group in groups.items() for i in range(0, len(group), CHUNK_SIZE)]
+
+
+def _rename_in_dir(parent: str, ops: List[RenameOp]) -> List[RenameResult]:
+    """ renames ops which share the parent dir (given with trailing '/', '' for cwd). """
+    syscalls.add('rename', len(ops))
+    if os.rename not in os.supports_dir_fd:
+        return [_rename(op, op.src, op.dst, None) for op in ops]
+    syscalls.add('open')
+    try:
+        dir_fd = os.open(parent or '.', os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as e:
+        return [RenameResult(op, e) for op in ops]
+    start = len(parent)
+    try:
+        return [_rename(op, op.src[start:], op.dst[start:], dir_fd) for op in ops]
+    finally:
+        os.close(dir_fd)
+
+
+def _rename(op: RenameOp, src: str, dst: str, dir_fd: Optional[int]) -> RenameResult:
+    try:
+        rename_noreplace(src, dst, dir_fd)
+    except OSError as e:
+        return RenameResult(op, e)
+    return RenameResult(op)
+
+
+def rename_noreplace(src: str, dst: str, dir_fd: Optional[int] = None):
+    """ renames src to dst (relative to dir_fd if given), raises FileExistsError if dst
+    exists. Uses renameat2(RENAME_NOREPLACE) where available, so the check is atomic.
+    Otherwise dst is checked right before the renaming. """
+    renameat2 = _load_renameat2()
+    if renameat2 is not None:
+        fd = dir_fd if dir_fd is not None else _AT_FDCWD
+        if renameat2(fd, os.fsencode(src), fd, os.fsencode(dst), RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        # file systems which don't support the flag report EINVAL
+        if err not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(err, os.strerror(err), src, None, dst)
+        syscalls.add('rename')
+    syscalls.add('lstat')
+    if os.path.lexists(dst) if dir_fd is None else _lexists_at(dst, dir_fd):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+    os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+
+
+def _load_renameat2():
+    global _renameat2
+    if _renameat2 is None:
+        try:
+            func = ctypes.CDLL(None, use_errno=True).renameat2
+            func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+            func.restype = ctypes.c_int
+            _renameat2 = func
+        except (AttributeError, OSError):
+            _renameat2 = False
+    return _renameat2 or None
+
+
+def _lexists_at(path: str, dir_fd: int) -> bool:
+    try:
+        os.lstat(path, dir_fd=dir_fd)
+    except FileNotFoundError:
+        return False
+    return True
@@ -0,0 +1,133 @@
+"""filter pipeline
+===============
+selection of the files/dirs to be renamed in one linear pass
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .matcher import GlobMatcher
+from .rules import RegexRule, RuleSet
+from .walker import PathEntry
+
+
+class FilterStage:
+    """ a single filter step: entries for which the predicate is false are dropped.
+    The message explains why nothing is left if this stage removed all entries,
+    '{total}' is replaced by the number of entries fed into the pipeline. """
+
+    __slots__ = ('name', 'predicate', 'message', 'passed')
+
+    def __init__(self, name: str, predicate: Callable[[PathEntry], bool], message: str):
+        self.name = name
+        self.predicate = predicate
+        self.message = message
+        self.passed = 0
+
+
+class FilterPipeline:
+    """ composes filter stages which are applied to each entry in a single pass.
+    Stages are checked in the order they were added, an entry is dropped at the
+    first stage it fails. """
+
+    def __init__(self):
+        self.stages: List[FilterStage] = []
+        self.total = 0
+
+    def add(self, name: str, predicate: Callable[[PathEntry], bool], message: str) -> 'FilterPipeline':
+        self.stages.append(FilterStage(name, predicate, message))
+        return self
+
+    def run(self, entries: Iterable[PathEntry]) -> Iterator[PathEntry]:
+        """ lazily yields all entries passing every stage and counts how many
+        entries passed each stage. """
+        self.total = 0
+        for stage in self.stages:
+            stage.passed = 0
+        stages = self.stages
+        for entry in entries:
+            self.total += 1
+            for stage in stages:
+                if not stage.predicate(entry):
+                    break
+                stage.passed += 1
+            else:
+                yield entry
+
+    def failed_stage(self) -> Optional[FilterStage]:
+        """ returns the first stage which removed all remaining entries (only
+        meaningful after run() was consumed), None if some entries are left. """
+        for stage in self.stages:
+            if not stage.passed:
+                return stage
+        return None
+
+    def failure_message(self) -> str:
+        stage = self.failed_stage()
+        return stage.message.replace('{total}', str(self.total)) if stage else ''
+
+
+def build_filter_pipeline(search_value: str, pattern_only: Optional[Sequence[str]] = None,
+                          except_pattern: Optional[Sequence[str]] = None, dirs_only: bool = False,
+                          files_only: bool = False,
+                          rules: Union[RuleSet, RegexRule, None] = None) -> FilterPipeline:
+    """ sets up the filter stages selected via the command line.
+
+    :argument
+      search_value: only names containing this value are kept
+      pattern_only: only names matching one of these globs are kept
+      except_pattern: names matching one of these globs are dropped
+      dirs_only/files_only: file type filters, they rely on the type known from the walk
+      rules (optional): RuleSet or RegexRule, replaces the search-value: only names
+            matched by one of the rules are kept
+
+    :returns
+      FilterPipeline
+    """
+    pipeline = FilterPipeline()
+    if rules is not None:
+        search = rules.search
+        pipeline.add(
+            'search-value',
+            lambda entry: search(entry.name),
+            'None of the selected {total} files/dirs contained ' + f'{rules.describe_search()} ',
+        )
+    else:
+        pipeline.add(
+            'search-value',
+            lambda entry: search_value in entry.name,
+            'None of the selected {total} files/dirs contained the search-value ' + f'{search_value!r} ',
+        )
+    if pattern_only:
+        include = GlobMatcher(pattern_only)
+        pipeline.add(
+            'pattern-only',
+            lambda entry: include(entry.name),
+            f'No file/dir present containing the pattern {_patterns_repr(pattern_only)} ',
+        )
+    if except_pattern:
+        exclude = GlobMatcher(except_pattern)
+        pipeline.add(
+            'except-pattern',
+            lambda entry: not exclude(entry.name),
+            f'No file/dir present containing the search-value {search_value!r} '
+            f'and not the except-pattern {_patterns_repr(except_pattern)} ',
+        )
+    if dirs_only:
+        pipeline.add(
+            'dirs-only',
+            lambda entry: entry.is_dir,
+            'No directory present after filtering out files.',
+        )
+    if files_only:
+        pipeline.add(
+            'files-only',
+            lambda entry: entry.is_file,
+            'No file present after filtering out directories.',
+        )
+    return pipeline
+
+
+def _patterns_repr(patterns: Sequence[str]) -> str:
+    return ', '.join(repr(pattern) for pattern in patterns)
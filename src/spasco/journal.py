@@ -0,0 +1,179 @@
+"""rename journal
+==============
+write-ahead journal of a renaming run, so an interrupted run can be resumed and
+a finished run can be undone without walking the tree again
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import json
+import os
+from typing import Iterator, List, NamedTuple, Optional, Set, TextIO
+
+from .executor import RenameResult, execute_batches
+from .planner import RenameOp, RenamePlan
+
+VERSION = 1
+# max. number of ops per batch
+BATCH_SIZE = 1000
+# the commit records of this many batches share one fsync call, they are always
+# synced before a shallower batch is executed
+SYNC_EVERY = 8
+
+# file layout (JSON lines):
+#   {"journal": 1, "base_dir": ..., "batches": n, "ops": n}
+#   {"batch": i, "ops": [[src, dst, depth, is_dir], ...]}    for all batches, deepest first
+#   {"done": i}                                               appended once batch i is renamed
+# All batch records are written and synced before the first renaming.
+
+
+class JournalError(ValueError):
+    """ raised if a file is not a valid journal. """
+
+
+class Batch(NamedTuple):
+    index: int
+    ops: List[RenameOp]
+
+
+class Journal:
+    """ an open journal file. Use create() for a new run and load() to resume or
+    undo a journaled run. """
+
+    def __init__(self, path: str, base_dir: str, batches: List[Batch], done: Set[int]):
+        self.path = path
+        self.base_dir = base_dir
+        self.batches = batches
+        self.done = done
+        self._fp: Optional[TextIO] = None
+        self._unsynced = 0
+
+    @classmethod
+    def create(cls, path: str, plan: RenamePlan, base_dir: str = '', batch_size: int = BATCH_SIZE) -> 'Journal':
+        """ writes the intents of all renamings of the plan and syncs them to disk. """
+        base_dir = base_dir or os.getcwd()
+        batches = []
+        for _, ops in plan.depth_buckets():
+            for start in range(0, len(ops), batch_size):
+                batches.append(Batch(len(batches), ops[start:start + batch_size]))
+        journal = cls(path, base_dir, batches, set())
+        journal._fp = open(path, 'w', encoding='utf-8')
+        journal._fp.write(json.dumps({'journal': VERSION, 'base_dir': base_dir,
+                                      'batches': len(batches), 'ops': len(plan)}) + '\n')
+        for batch in batches:
+            records = [[op.src, op.dst, op.depth, op.is_dir] for op in batch.ops]
+            journal._fp.write(json.dumps({'batch': batch.index, 'ops': records}) + '\n')
+        journal._sync()
+        _sync_dir(os.path.dirname(os.path.abspath(path)))
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> 'Journal':
+        """ reads a journal, relative paths are resolved against its base dir. A torn
+        last line (crash while appending) is ignored. """
+        with open(path, encoding='utf-8') as fp:
+            try:
+                header = json.loads(fp.readline())
+                if header.get('journal') != VERSION:
+                    raise JournalError(f"unsupported journal version {header.get('journal')}")
+            except (ValueError, AttributeError):
+                raise JournalError('not a spasco journal') from None
+            base_dir = header['base_dir']
+            prefix = base_dir.rstrip('/') + '/'
+            batches, done = [], set()
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if 'done' in record:
+                    done.add(record['done'])
+                    continue
+                ops = [RenameOp(src if src.startswith('/') else prefix + src,
+                                dst if dst.startswith('/') else prefix + dst, depth, is_dir)
+                       for src, dst, depth, is_dir in record['ops']]
+                batches.append(Batch(record['batch'], ops))
+        if len(batches) != header['batches']:
+            raise JournalError(f"journal is truncated ({len(batches)} of {header['batches']} batches)")
+        return cls(path, base_dir, batches, done)
+
+    def pending(self) -> List[Batch]:
+        return [batch for batch in self.batches if batch.index not in self.done]
+
+    def mark_done(self, batch: Batch) -> None:
+        """ appends the commit record of a batch, records are synced in groups. """
+        if self._fp is None:
+            self._fp = open(self.path, 'a', encoding='utf-8')
+        self._fp.write(json.dumps({'done': batch.index}) + '\n')
+        self.done.add(batch.index)
+        self._unsynced += 1
+        if self._unsynced >= SYNC_EVERY:
+            self._sync()
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._sync()
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _sync(self) -> None:
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._unsynced = 0
+
+
+def run_journal(journal: Journal, jobs: int = 1) -> Iterator[RenameResult]:
+    """ executes all pending batches of the journal and commits each of them. Used
+    for a new run as well as for resuming an interrupted one: ops of an uncommitted
+    batch whose source is gone but whose target exists were already renamed before
+    the interruption and are reported as successful. """
+    pending = journal.pending()
+    for batch, results in zip(pending, execute_batches(_committed_ops(journal, pending), jobs=jobs)):
+        for result in results:
+            if isinstance(result.error, FileNotFoundError) and _already_renamed(result.op):
+                result = RenameResult(result.op)
+            yield result
+        journal.mark_done(batch)
+
+
+def _committed_ops(journal: Journal, batches: List[Batch]) -> Iterator[List[RenameOp]]:
+    """ the ops of the batches. Before a shallower batch renames the parent dirs, the
+    commit records of the deeper ones are synced: a deeper batch re-run after a
+    crash would find neither the sources nor the targets under the old dir names. """
+    depth = None
+    for batch in batches:
+        if depth is not None and batch.ops[0].depth < depth and journal._unsynced:
+            journal._sync()
+        depth = batch.ops[0].depth
+        yield batch.ops
+
+
+def undo_journal(journal: Journal, jobs: int = 1) -> Iterator[RenameResult]:
+    """ renames everything back, shallowest batch first (the reverse of the run), so
+    the parents have their old names again before their content is renamed back.
+    Ops which were never executed are skipped. """
+    batches = [[RenameOp(op.dst, op.src, op.depth, op.is_dir) for op in batch.ops]
+               for batch in reversed(journal.batches)]
+    for results in execute_batches(batches, jobs=jobs):
+        for result in results:
+            if isinstance(result.error, FileNotFoundError) and os.path.lexists(result.op.dst):
+                continue  # not renamed by the journaled run
+            yield result
+
+
+def _already_renamed(op: RenameOp) -> bool:
+    return not os.path.lexists(op.src) and os.path.lexists(op.dst)
+
+
+def _sync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -19,20 +19,30 @@ command line tool for replacing spaces within files and directories
 
 import argparse
 import configparser
-import logging
+import contextlib
 import os
 import sys
-from typing import List
-import fnmatch
+from typing import TYPE_CHECKING, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
+from .filters import build_filter_pipeline
+from .matcher import GlobMatcher
+from .planner import InvalidNameError, RenameOp, RenamePlan, rename_ops
+from .rules import RegexRule, RuleSet, format_rule, parse_rule, parse_rules
 from .term_color import Txt, fmt
+from .walker import PathEntry, walk, walk_roots
+
+if TYPE_CHECKING:
+    from .dirindex import DirIndex
+    from .executor import RenameResult
+    from .references import ReferenceRewriter
+    from .stats import RunStats
+
+# the modules needed for renaming, previewing and the log are imported by the
+# functions using them, so e.g. 'spasco --version' starts without loading them.
 
 base, file = os.path.split(__file__)
 settings_file = os.path.join(base, 'settings.ini')
-
-# set up a settings file and then a logger:
-config = configparser.ConfigParser()
-config.read(settings_file)
+index_file = os.path.join(base, 'dirindex.bin')
 
 # some information about version, name, author, src
 __title__ = 'spasco'
@@ -41,34 +51,30 @@ __author__ = 'Niklas Tiede'
 __author_email__ = 'niklastiede2@gmail.com'
 __src_url__ = 'https://github.com/NiklasTiede/Spasco'
 
+SUBCOMMANDS = ('config', 'apply', 'undo', 'resume', 'watch')
 
-# default values for log record are created:
-if not config.read(settings_file):
-    config['VALUE-SETTINGS'] = {
-        'search_value': "' '",
-        'new_value': '_',
-    }
-    config['LOG-SETTINGS'] = {
-        'Logging_turned_on': False,
-        'logger_filename': f'{__title__}.log',
-        'logger_location': os.environ['HOME'],
-    }
-    with open(settings_file, 'w') as f:
-        config.write(f)
 
-# set a logger
-# TODO: log each renamed path
-logger_path = f"{config.get('LOG-SETTINGS', 'logger_location')}/{config.get('LOG-SETTINGS', 'logger_filename')}"
-logging.basicConfig(
-    filename=logger_path,
-    level=logging.INFO,
-    format='%(levelname)s | %(asctime)s | %(message)s'
-)
+_config: Optional[configparser.ConfigParser] = None
 
 
-if sys.platform != 'linux':
-    print(f"{__title__!r} is currently not optimized for Windows / OS X")
-    sys.exit(1)
+def load_config() -> configparser.ConfigParser:
+    """ the settings, read from the settings file when they are needed for the first
+    time. Settings missing in the file have their default values, the file itself
+    is only written by the config sub-command. """
+    global _config
+    if _config is None:
+        _config = configparser.ConfigParser()
+        _config['VALUE-SETTINGS'] = {
+            'search_value': "' '",
+            'new_value': '_',
+        }
+        _config['LOG-SETTINGS'] = {
+            'Logging_turned_on': False,
+            'logger_filename': f'{__title__}.log',
+            'logger_location': os.path.expanduser('~'),
+        }
+        _config.read(settings_file)
+    return _config
 
 
 def main(argv):
@@ -82,125 +88,494 @@ def main(argv):
         Zero on successful program termination, non-zero otherwise.
     """
 
-    parser = __build_parser()[0]
+    # argparse can't tell files/dirs from a sub-command if both are positional, so the
+    # files/dirs are left out if a sub-command is given and sub-commands are only added
+    # if one is given (or if the help is requested, so they are listed):
+    subcommand = len(argv) > 1 and argv[1] in SUBCOMMANDS
+    help_requested = '-h' in argv or '--help' in argv
+    parser = __build_parser(with_files=not subcommand, with_subcommands=subcommand or help_requested)[0]
     args = parser.parse_args(argv[1:])
 
-    logging.debug(vars(args))
-
     # triggering config subparser
     if vars(args).get('command', None) == 'config':
         execute_config(parser, argv)
         return 0
 
-    #######################
-    # 1 select/sort paths #
-    #######################
+    if vars(args).get('command', None) == 'apply':
+        return execute_apply(args)
 
-    files_dirs = []
+    if vars(args).get('command', None) in ('undo', 'resume'):
+        return execute_journal(args)
 
-    if args.file_or_dir and not args.recursive:
-        files_dirs.extend(args.file_or_dir)
+    if vars(args).get('command', None) == 'watch':
+        return execute_watch(args)
 
-    if args.recursive:
-        files_dirs = recurse_dirs_and_files()
+    stats = None
+    if args.stats:
+        from .stats import RunStats
+        stats = RunStats()
+    try:
+        if args.profile:
+            from .stats import profiled
+            with profiled(args.profile, sys.stderr):
+                return execute_run(parser, args, stats)
+        return execute_run(parser, args, stats)
+    finally:
+        if stats:
+            stats.write(sys.stderr, args.stats)
+
+
+def execute_run(parser, args, stats: Optional['RunStats'] = None) -> int:
+    """ selects, filters, previews and renames the files/dirs: the normal run without
+    sub-command.
+    :argument
+        stats (optional): the stages of the run are measured
+    """
 
-    # sort paths (longest paths first) so that renaming starts with the deepest nested file/directory:
-    files_dirs = [x.split('/') for x in files_dirs]
-    sorted_paths = sorted(files_dirs, key=len, reverse=True)
-    files_dirs = ['/'.join(path_as_lst) for path_as_lst in sorted_paths]
+    ##################
+    # 1 select paths #
+    ##################
+
+    paths = args.file_or_dir
+    if args.from_stdin0 or args.from_file:
+        if args.file_or_dir:
+            parser.error('files/directories cannot be combined with --from-stdin0/--from-file')
+        # read lazily while the entries are filtered and planned
+        paths = read_input_paths(args.from_file)
+
+    index = None
+    if args.recursive:
+        if args.index:
+            from .dirindex import DirIndex
+            index = DirIndex.load(index_file)
+        entries = recurse_dirs_and_files(roots=paths,
+                                         prune=GlobMatcher(args.prune) if args.prune else None,
+                                         max_depth=args.max_depth,
+                                         one_file_system=args.one_file_system,
+                                         jobs=args.jobs,
+                                         index=index)
+    else:
+        # without -r the selected files/dirs (default: the cwd's content) are taken as they are
+        # the file types of the cwd's content are taken from the scan, those of the
+        # given paths are only looked up for entries reaching the -d/-f filter
+        entries = (PathEntry.from_path(path) for path in paths) if paths else walk(max_depth=1)
 
     ########################
     #  2: path filtration  #
     ########################
 
-    SEARCH_VALUE = args.search_value if args.search_value else config.get('VALUE-SETTINGS', 'search_value')
-    if SEARCH_VALUE == "' '":
-        SEARCH_VALUE = ' '
+    SEARCH_VALUE, NEW_VALUE = rename_values(args)
+    rules = rename_rules(args)
 
-    filtered_paths = []
-    logging.debug(f'selected list before 1st filter: {files_dirs}')
-    all_selected_files_dirs = files_dirs.copy()
-    logging.debug(f'number of all files/dirs: {len(all_selected_files_dirs)}')
-    logging.debug(f'number of all files/dirs: {len(all_selected_files_dirs)}')
+    # all filters are applied in a single pass while the entries are generated:
+    pipeline = build_filter_pipeline(search_value=SEARCH_VALUE,
+                                     pattern_only=args.pattern_only,
+                                     except_pattern=args.except_pattern,
+                                     dirs_only=args.dirs_only,
+                                     files_only=args.files_only,
+                                     rules=rules)
 
-    # ------ search-value filter ------
-    [files_dirs.remove(x) for x in all_selected_files_dirs if not SEARCH_VALUE in x]
-    if not files_dirs:
-        print(f'None of the selected {len(all_selected_files_dirs)} files/dirs contained the search-value {SEARCH_VALUE!r} ')
-        return 1
-    logging.debug(f'selected list after 1st filter (search-value): {files_dirs}')
+    ################
+    #  3 renaming  #
+    ################
 
-    # ------ pattern-only filter ------
-    [files_dirs.remove(x) for x in files_dirs.copy() if args.pattern_only and
-     not fnmatch.fnmatch(os.path.split(x)[1], args.pattern_only)]
-    if not files_dirs:
-        print(f'No file/dir present containing the pattern {args.pattern_only!r} ')
+    from .preview import LiveProgress, pager, render_preview
+
+    # the walk, the filters and the planning are consumed lazily in one go:
+    progress = LiveProgress() if args.stream else None
+    if progress:
+        entries = progress.count_scanned(entries)
+    # all symlinks of the walk, not only the selected ones, may point to renamed files/dirs
+    symlinks: Optional[List[str]] = [] if args.retarget_symlinks else None
+    if symlinks is not None:
+        entries = _collect_symlinks(entries, symlinks)
+    if stats:
+        # the time of the filter stage is broken down into its predicates
+        matched = stats.iterate('filter', pipeline.run(stats.iterate('walk', entries)), upstream='walk')
+        for stage in pipeline.stages:
+            stage.predicate = stats.timed(f'filter: {stage.name}', stage.predicate)
+    else:
+        matched = pipeline.run(entries)
+    ops = rename_ops(matched, rules)
+    if progress:
+        ops = progress.show_matched(ops)
+    # all targets are computed and checked for collisions before anything is renamed,
+    # the plan is ordered by depth so that renaming starts with the deepest nested file/directory:
+    try:
+        with optional_stage(stats, 'plan', upstream='filter', kernel_stage='walk') as stage:
+            plan = RenamePlan(ops)
+            if stage:
+                stage.items_in, stage.items = stats.stage('filter').items, len(plan)
+    except InvalidNameError as e:
+        print(fmt(f'{e}, nothing was renamed.', textcolor=Txt.red))
         return 1
-    logging.debug(f'selected list after 2nd filter (pattern-only): {files_dirs}')
-
-    # ------ except-pattern filter -----
-    [files_dirs.remove(x) for x in files_dirs.copy() if args.pattern_only and
-     fnmatch.fnmatch(os.path.split(x)[1], args.pattern_only)]
-    if not files_dirs:
-        print(
-            f'No file/dir present containing the search-value {SEARCH_VALUE!r} and not the except-pattern {args.except_pattern!r} ')
+    finally:
+        if progress:
+            progress.close()
+    if stats:
+        passed = pipeline.total
+        for stage in pipeline.stages:
+            filter_stage = stats.stage(f'filter: {stage.name}')
+            filter_stage.items_in, filter_stage.items, passed = passed, stage.passed, stage.passed
+        stats.stage('filter').items_in = pipeline.total
+    if index is not None:
+        try:
+            index.save(index_file)
+        except OSError as e:
+            sys.stderr.write(f'{__title__}: the directory index cannot be saved to {index_file!r}: {e.strerror}\n')
+    if pipeline.failed_stage() is not None:
+        print(pipeline.failure_message())
         return 1
-    logging.debug(f'selected list after 3rd filter (except-pattern): {files_dirs}')
-
-    # ------ dirs-only filter -----
-    [files_dirs.remove(x) for x in files_dirs.copy() if args.dirs_only and not os.path.isdir(x)]
-    if not files_dirs:
-        print(f'No directory present after filtering out files.')
+    if not plan:
+        print(f'Replacing {rules} does not change any name.')
+        return 1
+    with optional_stage(stats, 'conflicts') as stage:
+        conflicts = plan.conflicts()
+        if stage:
+            stage.items_in, stage.items = len(plan), len(conflicts)
+    if conflicts:
+        print(fmt(f'{len(conflicts)} conflicts found, nothing was renamed:', textcolor=Txt.red))
+        for conflict in conflicts:
+            print(f"  {conflict.target!r} <-- {', '.join(map(repr, conflict.sources))} ({conflict.reason})")
         return 1
-    logging.debug(f'selected list after 4th filter (dirs-only): {files_dirs}')
+    if args.plan_out:
+        from .planfile import write_plan
+        with open(args.plan_out, 'wb') as fp:
+            count = write_plan(plan, fp)
+        print(f'{count} renamings were written to {args.plan_out!r}, apply them with: {__title__} apply {args.plan_out}')
+        return 0
+    if args.stream:
+        print(f'{len(plan)} files/directories can be renamed.')
+    elif args.pager:
+        with pager() as stream:
+            render_preview(plan, stream=stream, limit=args.preview_limit)
+    else:
+        with optional_stage(stats, 'preview') as stage:
+            render_preview(plan, limit=args.preview_limit)
+            if stage:
+                stage.items = len(plan) if args.preview_limit is None else min(len(plan), args.preview_limit)
+
+    is_proceeding = confirm('OK to proceed with renaming? [y/n] ', from_tty=args.from_stdin0)
 
-    # ------ files-only filter -----
-    [files_dirs.remove(x) for x in files_dirs.copy() if args.files_only and
-     not os.path.isfile(x)]
-    if not files_dirs:
-        print(f'No file present after filtering out directories.')
+    if is_proceeding.lower() == 'y':
+        # the files are selected by the names they have before renaming
+        reference_paths = [plan.final_path(path) for path in reference_files(args.update_references)] \
+            if args.update_references else None
+        rewriter = None
+        if reference_paths is not None:
+            # the matcher of all renamed paths is built before anything is renamed
+            try:
+                rewriter = reference_rewriter(plan, plan)
+            except ValueError as e:
+                print(fmt(f'The references cannot be updated: {e}, nothing was renamed.', textcolor=Txt.red))
+                return 1
+        renamed: List[RenameOp] = []
+        with optional_stage(stats, 'rename') as stage:
+            counts = execute_renaming(plan, jobs=args.jobs, journal_path=args.journal,
+                                      renamed=renamed if args.update_references or symlinks is not None else None)
+            if stage:
+                stage.items_in, stage.items = len(plan), counts.renamed
+        print(f'{counts.files} files and {counts.dirs} directories were renamed.')
+        failed = counts.failed
+        if symlinks is not None:
+            with optional_stage(stats, 'symlinks') as stage:
+                retargeted, failed_links = retarget_symlinks(plan, renamed, symlinks)
+                if stage:
+                    stage.items_in, stage.items = len(symlinks), retargeted
+            failed += failed_links
+        if rewriter is not None:
+            if counts.failed:
+                # only the paths which were renamed (a subset of the plan's paths)
+                rewriter = reference_rewriter(plan, renamed)
+            with optional_stage(stats, 'references') as stage:
+                updated, failed_files = update_references(rewriter, reference_paths)
+                if stage:
+                    stage.items_in, stage.items = len(reference_paths), updated
+            failed += failed_files
+        return 1 if failed else 0
+    else:
+        print(fmt("command aborted.", textcolor=Txt.greenblue))
         return 1
-    logging.debug(f'selected list after 5th filter (files-only): {files_dirs}')
-    filtered_paths = files_dirs
 
-    ################
-    #  3 renaming  #
-    ################
 
-    NEW_VALUE = args.new_value if args.new_value else config.get('VALUE-SETTINGS', 'new_value')
+@contextlib.contextmanager
+def optional_stage(stats, name: str, **options):
+    """ measures a stage if --stats is given, yields the StageStats or None. """
+    if stats is None:
+        yield None
+    else:
+        with stats.measure(name, **options) as stage:
+            yield stage
+
+
+def read_input_paths(file: Optional[str] = None) -> Iterator[str]:
+    """ lazily reads NUL-delimited paths (as written by find -print0), so the
+    selection is streamed into the filters without building argv.
+    :argument
+        file (optional): file to read from, default is stdin
+    """
+    from .planfile import iter_nul_delimited
+    fp = open(file, 'rb') if file else sys.stdin.buffer
+    try:
+        for field in iter_nul_delimited(fp):
+            if field:
+                yield os.fsdecode(field)
+    finally:
+        if file:
+            fp.close()
+
+
+def confirm(prompt: str, from_tty: bool = False) -> str:
+    """ asks the user, from the terminal if stdin is used for the input paths. """
+    if not from_tty:
+        return input(prompt)
+    try:
+        with open('/dev/tty', 'r+') as tty:
+            tty.write(prompt)
+            tty.flush()
+            return tty.readline().strip()
+    except OSError:
+        print('There is no terminal to confirm the renaming, use --plan-out and the apply sub-command.')
+        return 'n'
+
+
+def rename_values(args) -> Tuple[str, str]:
+    """ search-value and new-value, taken from the config if not given. """
+    search_value = args.search_value if args.search_value else load_config().get('VALUE-SETTINGS', 'search_value')
+    if search_value == "' '":
+        search_value = ' '
+    new_value = args.new_value if args.new_value else load_config().get('VALUE-SETTINGS', 'new_value')
+    return search_value, new_value
+
+
+def rename_rules(args) -> Union[RuleSet, RegexRule]:
+    """ the search-value --> new-value rule followed by the rules given with --rule,
+    or else the rules of the config. All of them are applied to a name in one pass.
+    With --regex the search-value is a regular expression and there are no rules. """
+    if args.regex:
+        if args.rules:
+            raise ValueError('--rule cannot be combined with --regex')
+        return RegexRule(*rename_values(args))
+    extra_rules = args.rules or parse_rules(load_config().get('VALUE-SETTINGS', 'rules', fallback=''))
+    return RuleSet([rename_values(args)] + list(extra_rules))
+
+
+class RenameCounts(NamedTuple):
+    """ renamed files, renamed dirs and failed renamings of a run. """
+    files: int
+    dirs: int
+    failed: int
+
+    @property
+    def renamed(self) -> int:
+        return self.files + self.dirs
+
+
+def execute_renaming(plan: RenamePlan, jobs: int = 1, journal_path: Optional[str] = None,
+                     renamed: Optional[List[RenameOp]] = None) -> RenameCounts:
+    """ renames the files/dirs of the plan and reports failed renamings.
+    :argument
+        journal_path (optional): the renamings are recorded in a write-ahead journal
+        renamed (optional): list the successful ops are appended to
+    :returns
+        numbers of renamed files and dirs and of failed renamings
+    """
+    from .executor import execute_plan
+    from .journal import Journal, run_journal
+    if journal_path:
+        with Journal.create(journal_path, plan) as journal:
+            return report_results(_collect_renamed(run_journal(journal, jobs=jobs), renamed))
+    return report_results(_collect_renamed(execute_plan(plan, jobs=jobs), renamed))
+
 
-    renamed_paths = path_renaming(path_lst=filtered_paths,
-                                  search_value=SEARCH_VALUE,
-                                  new_value=NEW_VALUE)
+def _collect_renamed(results: Iterable['RenameResult'], renamed: Optional[List[RenameOp]]) -> Iterator['RenameResult']:
+    for result in results:
+        if renamed is not None and result.error is None:
+            renamed.append(result.op)
+        yield result
 
-    print(f'{len(filtered_paths)} files/directories can be renamed:')
 
-    print(f"before {' ' * (max([len(x) for x in filtered_paths]) - len('before') + 6)} after")
+def _collect_symlinks(entries: Iterable[PathEntry], symlinks: List[str]) -> Iterator[PathEntry]:
+    for entry in entries:
+        if entry.is_symlink:
+            symlinks.append(entry.path)
+        yield entry
 
-    for before, after in list(zip(filtered_paths, renamed_paths)):
-        print(f"{before!r}{' ' * (max([len(x) for x in filtered_paths]) - len(before))} --> {after!r}")
 
-    is_proceeding = input('OK to proceed with renaming? [y/n] ')
+def retarget_symlinks(plan: RenamePlan, renamed: Iterable[RenameOp], symlinks: Iterable[str]) -> Tuple[int, int]:
+    """ recreates the symlinks pointing to renamed files/dirs (or into renamed dirs)
+    and reports links which cannot be recreated.
+    :returns
+        number of retargeted and of failed symlinks
+    """
+    from .symlinks import SymlinkRetargeter
+    retargeter = SymlinkRetargeter((op.src, plan.final_path(op.src)) for op in renamed)
+    retargeted, failed = 0, 0
+    for result in retargeter.retarget_all((link, plan.final_path(link)) for link in symlinks):
+        if result.error is not None:
+            failed += 1
+            sys.stderr.write(f'{__title__}: cannot retarget the symlink {result.path!r}: {result.error.strerror}\n')
+        else:
+            retargeted += 1
+    print(f'{retargeted} symlinks were retargeted.')
+    return retargeted, failed
 
-    if is_proceeding.lower() == 'y':
-        path_renaming(path_lst=filtered_paths, search_value=SEARCH_VALUE, new_value=NEW_VALUE, renaming=True)
-        filecount, dircount = 0, 0
-        for path in filtered_paths:
-            if os.path.isdir(path):
-                dircount += 1
-            if os.path.isfile(path):
-                filecount += 1
-        print(f'{filecount} files and {dircount} directories were renamed.')
-        return 0
-    else:
-        print(fmt("command aborted.", textcolor=Txt.greenblue))
+
+def reference_files(patterns: Sequence[str]) -> Iterator[str]:
+    """ the regular files matching the --update-references globs. """
+    from .references import reference_files
+    return reference_files(patterns)
+
+
+def reference_rewriter(plan: RenamePlan, ops: Iterable[RenameOp]) -> 'ReferenceRewriter':
+    """ replaces the old paths of the ops by their paths after all renamings of the plan.
+    :raises
+        ValueError: the paths cannot be matched
+    """
+    from .references import ReferenceRewriter
+    return ReferenceRewriter((op.src, plan.final_path(op.src)) for op in ops)
+
+
+def update_references(rewriter: 'ReferenceRewriter', paths: Iterable[str]) -> Tuple[int, int]:
+    """ replaces the old paths of the renamed files/dirs within the files and reports
+    files which cannot be rewritten.
+    :returns
+        number of updated and of failed files
+    """
+    updated, failed, references = 0, 0, 0
+    for update in rewriter.rewrite_all(paths):
+        if update.error is not None:
+            failed += 1
+            sys.stderr.write(f'{__title__}: cannot update the references in {update.path!r}: '
+                             f'{update.error.strerror}\n')
+        elif update.replaced:
+            updated += 1
+            references += update.replaced
+    print(f'{references} references were updated in {updated} files.')
+    return updated, failed
+
+
+def report_results(results: Iterable['RenameResult']) -> RenameCounts:
+    """ logs successful renamings (if logging is turned on) and reports failed ones.
+    The counts are taken from the results, the renamed paths aren't stat'ed again.
+    :returns
+        numbers of renamed files and dirs and of failed renamings
+    """
+    from .rename_log import rename_logging
+    files, dirs, failed = 0, 0, 0
+    cwd = os.getcwd()
+    with rename_logging(rename_log_path()) as logger:
+        for result in results:
+            if result.error is not None:
+                failed += 1
+                sys.stderr.write(f'{__title__}: cannot rename {result.op.src!r} --> {result.op.dst!r}: '
+                                 f'{result.error.strerror}\n')
+                continue
+            if result.op.is_dir:
+                dirs += 1
+            else:
+                files += 1
+            logger.info(' working dir: %r | naming: %r --> %r', cwd, result.op.src, result.op.dst)
+    return RenameCounts(files, dirs, failed)
+
+
+def rename_log_path() -> Optional[str]:
+    """ path of the log file, None if logging is turned off. """
+    config = load_config()
+    if not config.getboolean('LOG-SETTINGS', 'logging_turned_on', fallback=False):
+        return None
+    return os.path.join(config.get('LOG-SETTINGS', 'logger_location'), config.get('LOG-SETTINGS', 'logger_filename'))
+
+
+def execute_apply(args) -> int:
+    """ executes a plan file written with --plan-out, without walking or filtering
+    again. Files/dirs which were renamed or removed in the meantime are reported by
+    the renaming itself, existing targets are never replaced. """
+    from .planfile import PlanFileError, read_plan
+    try:
+        with open(args.plan_file, 'rb') as fp:
+            base_dir, plan = read_plan(fp)
+    except (OSError, PlanFileError) as e:
+        print(f'The plan file {args.plan_file!r} cannot be read: {e}')
         return 1
+    print(f'applying {len(plan)} renamings within {base_dir!r}')
+    counts = execute_renaming(plan, jobs=args.jobs, journal_path=args.journal)
+    print(f'{counts.renamed} files/directories were renamed, {counts.failed} failed.')
+    return 1 if counts.failed else 0
+
+
+def execute_journal(args) -> int:
+    """ resumes an interrupted journaled run or undoes a journaled run. """
+    from .journal import Journal, JournalError, run_journal, undo_journal
+    try:
+        journal = Journal.load(args.journal_file)
+    except (OSError, JournalError) as e:
+        print(f'The journal {args.journal_file!r} cannot be read: {e}')
+        return 1
+    with journal:
+        if args.command == 'resume':
+            pending = sum(len(batch.ops) for batch in journal.pending())
+            print(f'resuming {pending} renamings within {journal.base_dir!r}')
+            counts = report_results(run_journal(journal, jobs=args.jobs))
+            print(f'{counts.renamed} files/directories were renamed, {counts.failed} failed.')
+        else:
+            counts = report_results(undo_journal(journal, jobs=args.jobs))
+            print(f'{counts.renamed} renamings were undone, {counts.failed} failed.')
+    return 1 if counts.failed else 0
+
+
+def execute_watch(args) -> int:
+    """ renames new and moved-in files/dirs as soon as they arrive in the watched
+    directories, until interrupted. Each batch of arrivals is filtered, planned and
+    renamed like the files/dirs selected by a normal run, without a prompt. """
+    from .executor import execute_plan
+    from .watcher import Watcher
+    rules = rename_rules(args)
+    search_value = rules.rules[0][0]
+    prune = GlobMatcher(args.prune) if args.prune else None
+    roots = args.watch_dirs or ['.']
+    with Watcher(roots, recursive=args.recursive, prune=prune, window=args.window / 1000) as watcher:
+        print(f'watching {len(roots)} directories for replacing {rules}, stop with Ctrl+C')
+        try:
+            for entries in watcher.batches():
+                pipeline = build_filter_pipeline(search_value=search_value,
+                                                 pattern_only=args.pattern_only,
+                                                 except_pattern=args.except_pattern,
+                                                 dirs_only=args.dirs_only,
+                                                 files_only=args.files_only,
+                                                 rules=rules)
+                try:
+                    plan = RenamePlan(rename_ops(pipeline.run(entries), rules))
+                except InvalidNameError as e:
+                    print(fmt(f'  {e}, the batch was not renamed', textcolor=Txt.red))
+                    continue
+                conflicts = plan.conflicts()
+                if conflicts:
+                    for conflict in conflicts:
+                        print(fmt(f"  {conflict.target!r} <-- {', '.join(map(repr, conflict.sources))} "
+                                  f"({conflict.reason}), not renamed", textcolor=Txt.red))
+                    blocked = {source for conflict in conflicts for source in conflict.sources}
+                    plan = RenamePlan(op for op in plan if op.src not in blocked)
+                for op in plan:
+                    print(f'{op.src!r} --> {op.dst!r}')
+                report_results(_notify_renamed(watcher, execute_plan(plan, jobs=args.jobs)))
+        except KeyboardInterrupt:
+            print(fmt('stopped watching.', textcolor=Txt.greenblue))
+    return 0
+
+
+def _notify_renamed(watcher, results: Iterable['RenameResult']) -> Iterator['RenameResult']:
+    for result in results:
+        if result.error is None:
+            watcher.renamed(result.op.src, result.op.dst, result.op.is_dir)
+        yield result
 
 
 def execute_config(parser, argv):
     """ subparser triggering from main is refactored in here. """
     subparser = __build_parser()[1]
     args = parser.parse_args(argv[1:])
+    config = load_config()
 
     # # use as error handling, to let people know, that a
     # boom = vars(args).copy()
@@ -212,6 +587,8 @@ def execute_config(parser, argv):
         print(f'{fmt("value settings:", Txt.greenblue)}')
         print(f"  search_value: {config.get('VALUE-SETTINGS', 'search_value')}")
         print(f"  new_value: {config.get('VALUE-SETTINGS', 'new_value')}")
+        for rule in parse_rules(config.get('VALUE-SETTINGS', 'rules', fallback='')):
+            print(f'  rule: {format_rule(rule)}')
         print(f'{fmt("log settings:", Txt.greenblue)}')
         print(f"  logging_turned_on: {config.getboolean('LOG-SETTINGS', 'logging_turned_on')}")
         print(f"  logger_filename: {config.get('LOG-SETTINGS', 'logger_filename')}")
@@ -264,43 +641,51 @@ def execute_config(parser, argv):
         print(f"The new 'new-value' is {config.get('VALUE-SETTINGS', 'new_value')}")
         return 0
 
+    if args.add_rules or args.clear_rules:
+        rules = [] if args.clear_rules else parse_rules(config.get('VALUE-SETTINGS', 'rules', fallback=''))
+        rules += args.add_rules or []
+        # '%' has to be escaped for the interpolation of configparser
+        config['VALUE-SETTINGS']['rules'] = '\n'.join(format_rule(rule) for rule in rules).replace('%', '%%')
+        with open(settings_file, 'w') as fp:
+            config.write(fp)
+        print(f'The rules are {RuleSet(rules) if rules else None}')
+        return 0
+
     subparser.print_help()
     return 1
 
 
 def path_renaming(path_lst: List[str], search_value: str, new_value: str, renaming: bool = False) -> List[str]:
-    """ names if renamed paths are returned and they can be  """
-    renamed_paths = []
-    for old_path_name in path_lst:
-        path_base, file = os.path.split(old_path_name)
-        new_name = file.replace(search_value, new_value)
-        full_new = os.path.join(path_base, new_name)
-        renamed_paths.append(full_new)
-        if renaming:
-            os.rename(old_path_name, full_new)
-            logging.info(f" working dir: {os.getcwd()!r} | naming: {old_path_name!r} --> {full_new!r}")
+    """ the paths of the files/dirs with search_value replaced by new_value in their
+    names. If renaming is true they are renamed like in a normal run (deepest
+    first, logged, existing targets are never replaced). """
+    rules = RuleSet([(search_value, new_value)])
+    renamed_paths = [os.path.join(os.path.dirname(path), rules(os.path.basename(path))) for path in path_lst]
+    if renaming:
+        from .executor import execute_plan
+        report_results(execute_plan(RenamePlan(rename_ops((PathEntry.from_path(path) for path in path_lst), rules))))
     return renamed_paths
 
 
-def recurse_dirs_and_files() -> List[str]:
-    """ all directories and files
+def recurse_dirs_and_files(roots: Optional[Sequence[str]] = None, prune: Optional[GlobMatcher] = None,
+                           max_depth: Optional[int] = None, one_file_system: bool = False,
+                           jobs: int = 1, index: Optional['DirIndex'] = None) -> Iterator[PathEntry]:
+    """ all directories and files below the roots, yielded lazily while walking.
+    :argument
+        roots (optional): files/dirs to start from (yielded as well), default is the cwd's content
+        prune (optional): directories matching these globs are skipped without being opened
+        max_depth (optional): number of directory levels to descend into
+        one_file_system: don't descend into directories on other file systems
+        jobs: number of threads scanning the roots and their subtrees concurrently
+        index (optional): DirIndex of previous runs, unchanged dirs aren't read again
     :returns
-        all dirs and files recursive, sorted
+        generator of PathEntry objects (relative path, depth and file type)
     """
-    all_files_dirs = []
-    base_path = os.getcwd()
-    # collect all rel. paths in a list (rel to cwd):
-    for dirpath, dirnames, filenames in os.walk(base_path):
-        for filename in filenames:
-            full_filepath = dirpath + '/' + filename
-            rel_filepath = os.path.relpath(full_filepath, base_path)
-            all_files_dirs.append(rel_filepath)
-        for dirname in dirnames:
-            full_dirpath = dirpath + '/' + dirname
-            rel_dirpath = os.path.relpath(full_dirpath, base_path)
-            # print('rel. dirpath:', rel_dirpath.split('/'))
-            all_files_dirs.append(rel_dirpath)
-    return all_files_dirs
+    options = dict(prune=prune, max_depth=max_depth, one_file_system=one_file_system, jobs=jobs, index=index)
+    if roots:
+        yield from walk_roots(roots, **options)
+    else:
+        yield from walk('.', **options)
 
 
 # hack for removing the metavar below the subparsers title
@@ -340,11 +725,15 @@ class MyOwnFormatter(NoSubparsersMetavarFormatter, argparse.RawDescriptionHelpFo
     pass
 
 
-def __build_parser():
+def __build_parser(with_files: bool = True, with_subcommands: bool = True):
     """Constructs the main_parser for the command line arguments.
 
+    :argument
+      with_files: if false, the positional files/dirs argument isn't added
+      with_subcommands: if false, the sub-command parsers aren't added
+
     :returns
-      An ArgumentParser instance for the CLI.
+      An ArgumentParser instance for the CLI and the config subparser (or None).
     """
     # noinspection PyTypeChecker
     main_parser = argparse.ArgumentParser(
@@ -357,17 +746,141 @@ def __build_parser():
     )
 
     # positional arguments:
-    main_parser.add_argument(
-        'file_or_dir',
-        metavar='files/directories',
-        action='store',
-        nargs='*',
-        default=os.listdir(),
-        help='Select files/dirs to be renamed. Default: current directory is listed.'
-    )
+    if with_files:
+        main_parser.add_argument(
+            'file_or_dir',
+            metavar='files/directories',
+            action='store',
+            nargs='*',
+            help='Select files/dirs to be renamed (with -r: dirs to recurse into). Default: current directory is listed.'
+        )
 
     # optional arguments:
+    add_rename_arguments(main_parser)
+    main_parser.add_argument(
+        '-r',
+        '--recursive',
+        action='store_true',
+        help='Recurse into directories.'
+    )
+    input_group = main_parser.add_mutually_exclusive_group()
+    input_group.add_argument(
+        '--from-stdin0',
+        action='store_true',
+        help='Read the files/dirs to be renamed (with -r: to recurse into) NUL-delimited from stdin, e.g. from find -print0.'
+    )
+    input_group.add_argument(
+        '--from-file',
+        metavar='file',
+        help='Read the files/dirs NUL-delimited from a file.'
+    )
+    main_parser.add_argument(
+        '--exclude-dir',
+        '--prune',
+        dest='prune',
+        action='append',
+        metavar='pattern',
+        help='Directories matching the pattern are skipped when recursing. Can be repeated.'
+    )
+    main_parser.add_argument(
+        '--max-depth',
+        type=int,
+        metavar='N',
+        help='Descend at most N directory levels when recursing.'
+    )
+    main_parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Scan the directory trees and rename with N threads. Default: 1'
+    )
+    main_parser.add_argument(
+        '--one-file-system',
+        action='store_true',
+        help="Don't descend into directories on other file systems when recursing."
+    )
+    main_parser.add_argument(
+        '--index',
+        action='store_true',
+        help='Reuse the listings of unchanged directories from previous runs when recursing.'
+    )
     main_parser.add_argument(
+        '--plan-out',
+        metavar='file',
+        help='Write the renamings to a plan file instead of renaming, see the apply sub-command.'
+    )
+    main_parser.add_argument(
+        '--journal',
+        metavar='file',
+        help='Record the renamings in a journal, see the undo and resume sub-commands.'
+    )
+    main_parser.add_argument(
+        '--retarget-symlinks',
+        action='store_true',
+        help='Recreate the symlinks found while selecting/recursing which point to renamed files/dirs.'
+    )
+    main_parser.add_argument(
+        '--update-references',
+        action='append',
+        metavar='glob',
+        help="Replace the old paths of the renamed files/dirs within the files matching the glob ('**' for any dirs). "
+             'Can be repeated.'
+    )
+    main_parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Show the renamings while the directory trees are still being scanned.'
+    )
+    main_parser.add_argument(
+        '--preview-limit',
+        type=int,
+        metavar='N',
+        help='Only the first N renamings are previewed, followed by a summary.'
+    )
+    main_parser.add_argument(
+        '--pager',
+        action='store_true',
+        help='Show the preview in a pager ($PAGER, default: less).'
+    )
+    main_parser.add_argument(
+        '--stats',
+        nargs='?',
+        const='text',
+        choices=['text', 'json'],
+        metavar='format',
+        help='Write the time, the number of files/dirs and the syscalls of each stage to stderr, as text or json. Default: text'
+    )
+    main_parser.add_argument(
+        '--profile',
+        choices=['cpu', 'memory'],
+        help='Write a cProfile (cpu) or tracemalloc (memory) report of the run to stderr.'
+    )
+    main_parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        help='Show version number and exit.',
+        version=f'%(prog)s {__version__}'
+    )
+    add_parser_help(main_parser)
+    if not with_subcommands:
+        return main_parser, None
+
+    # ---- configuration structured as subparser -----
+    config_subparsers = main_parser.add_subparsers(title='sub-commands',)
+    config_subparser = add_config_subparser(config_subparsers)
+    add_apply_subparser(config_subparsers)
+    add_journal_subparsers(config_subparsers)
+    add_watch_subparser(config_subparsers)
+    return main_parser, config_subparser
+
+
+def add_rename_arguments(parser):
+    """ the options selecting and renaming the files/dirs, shared by the main parser
+    and the watch sub-command. """
+    parser.add_argument(
         '-s',
         dest='search_value',
         nargs='?',
@@ -375,7 +888,7 @@ def __build_parser():
         metavar='search_value',
         help='Searches for characters/patterns to be replaced other than whitespaces.',
     )
-    main_parser.add_argument(
+    parser.add_argument(
         '-n',
         dest='new_value',
         nargs='?',
@@ -383,53 +896,52 @@ def __build_parser():
         metavar='new_value',
         help='substitutes the search-value for custom characters/patterns other than underscores.'
     )
-    main_parser.add_argument(
+    parser.add_argument(
+        '--rule',
+        dest='rules',
+        type=rule_argument,
+        action='append',
+        metavar='OLD=NEW',
+        help='Replaces OLD by NEW as well, in the same pass. Can be repeated. Default: rules of the config.'
+    )
+    parser.add_argument(
+        '--regex',
+        action='store_true',
+        help='The search-value is a regular expression, the new-value can refer to its groups (\\1, \\g<name>).'
+    )
+    parser.add_argument(
         '-p',
         dest='pattern_only',
-        nargs='?',
-        action='store',
+        action='append',
         metavar='pattern_only',
-        help='Only files/dirs containing the pattern are renamed.'
+        help='Only files/dirs containing the pattern are renamed. Can be repeated.'
     )
-    main_parser.add_argument(
+    parser.add_argument(
         '-e',
         metavar='except_pattern',
         dest='except_pattern',
-        nargs='?',
-        action='store',
-        help='Only files/dirs not containing the pattern are renamed.'
+        action='append',
+        help='Only files/dirs not containing the pattern are renamed. Can be repeated.'
     )
-    main_parser.add_argument(
+    parser.add_argument(
         '-d',
         '--dirs-only',
         action='store_true',
         help='Only directories are renamed.'
     )
-    main_parser.add_argument(
+    parser.add_argument(
         '-f',
         '--files-only',
         action='store_true',
         help='Only files are renamed.'
     )
-    main_parser.add_argument(
-        '-r',
-        '--recursive',
-        action='store_true',
-        help='Recurse into directories.'
-    )
-    main_parser.add_argument(
-        '-v',
-        '--version',
-        action='version',
-        help='Show version number and exit.',
-        version=f'%(prog)s {__version__}'
-    )
-    add_parser_help(main_parser)
 
-    # ---- configuration structured as subparser -----
-    config_subparsers = main_parser.add_subparsers(title='log and rename configuration',)
-    config_subparser = add_config_subparser(config_subparsers)
-    return main_parser, config_subparser
+
+def rule_argument(text: str):
+    try:
+        return parse_rule(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
 
 
 def add_config_subparser(sub_parsers):
@@ -489,11 +1001,136 @@ def add_config_subparser(sub_parsers):
         dest='set_new_value',
         help='Set up a new value which will replace the search-value.',
     )
+    config_subparser_renaming.add_argument(
+        '-r',
+        type=rule_argument,
+        action='append',
+        metavar='OLD=NEW',
+        dest='add_rules',
+        help='Add a rule applied together with the search-value. Can be repeated.',
+    )
+    config_subparser_renaming.add_argument(
+        '--clear-rules',
+        action='store_true',
+        help='Remove all rules (before adding the ones given with -r).',
+    )
 
     config_subparser.set_defaults(command='config')
     return config_subparser
 
 
+def add_apply_subparser(sub_parsers):
+    apply_subparser = sub_parsers.add_parser(
+        name='apply',
+        description='Executes the renamings of a plan file written with --plan-out. The '
+                    'directory tree is not walked and filtered again.',
+        add_help=False,
+        formatter_class=lambda prog: argparse.RawDescriptionHelpFormatter(prog, max_help_position=33),
+        help='Sub-command to execute a plan file written with --plan-out.',
+    )
+    apply_subparser.add_argument(
+        'plan_file',
+        metavar='plan_file',
+        help='Plan file to be executed.'
+    )
+    apply_subparser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Rename with N threads. Default: 1'
+    )
+    apply_subparser.add_argument(
+        '--journal',
+        metavar='file',
+        help='Record the renamings in a journal, see the undo and resume sub-commands.'
+    )
+    add_parser_help(apply_subparser)
+    apply_subparser.set_defaults(command='apply')
+    return apply_subparser
+
+
+def add_journal_subparsers(sub_parsers):
+    descriptions = {
+        'undo': 'Renames all files/dirs recorded in a journal back to their old names.',
+        'resume': 'Continues an interrupted run from the last committed batch of its journal.',
+    }
+    for name, description in descriptions.items():
+        journal_subparser = sub_parsers.add_parser(
+            name=name,
+            description=description,
+            add_help=False,
+            formatter_class=lambda prog: argparse.RawDescriptionHelpFormatter(prog, max_help_position=33),
+            help=f'Sub-command to {name} a run recorded with --journal.',
+        )
+        journal_subparser.add_argument(
+            'journal_file',
+            metavar='journal_file',
+            help='Journal written with --journal.'
+        )
+        journal_subparser.add_argument(
+            '-j',
+            '--jobs',
+            type=int,
+            default=1,
+            metavar='N',
+            help='Rename with N threads. Default: 1'
+        )
+        add_parser_help(journal_subparser)
+        journal_subparser.set_defaults(command=name)
+
+
+def add_watch_subparser(sub_parsers):
+    watch_subparser = sub_parsers.add_parser(
+        name='watch',
+        description='Watches directories with inotify and renames new and moved-in '
+                    'files/dirs as soon as they arrive, until interrupted.',
+        add_help=False,
+        formatter_class=lambda prog: argparse.RawDescriptionHelpFormatter(prog, max_help_position=33),
+        help='Sub-command to rename new files/dirs while watching directories.',
+    )
+    watch_subparser.add_argument(
+        'watch_dirs',
+        metavar='directories',
+        nargs='*',
+        help='Directories to be watched. Default: current directory.'
+    )
+    add_rename_arguments(watch_subparser)
+    watch_subparser.add_argument(
+        '-r',
+        '--recursive',
+        action='store_true',
+        help='Watch the subdirectories as well.'
+    )
+    watch_subparser.add_argument(
+        '--exclude-dir',
+        '--prune',
+        dest='prune',
+        action='append',
+        metavar='pattern',
+        help='Directories matching the pattern are not watched. Can be repeated.'
+    )
+    watch_subparser.add_argument(
+        '--window',
+        type=float,
+        default=50,
+        metavar='ms',
+        help='Arrivals within this many milliseconds are renamed together. Default: 50'
+    )
+    watch_subparser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Rename with N threads. Default: 1'
+    )
+    add_parser_help(watch_subparser)
+    watch_subparser.set_defaults(command='watch')
+    return watch_subparser
+
+
 def add_parser_help(parser):
     """
     So we can use consistent capitalization and periods in the help. You must
@@ -510,6 +1147,9 @@ def add_parser_help(parser):
 
 
 def run_main():
+    if sys.platform != 'linux':
+        print(f"{__title__!r} is currently not optimized for Windows / OS X")
+        sys.exit(1)
     try:
         sys.exit(main(sys.argv))
     except Exception as e:
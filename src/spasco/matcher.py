@@ -0,0 +1,55 @@
+"""glob matcher
+============
+matching names against many glob patterns at once
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import fnmatch
+import re
+from typing import Iterable
+
+_MAGIC = re.compile('[*?[]')
+
+
+class GlobMatcher:
+    """ matches a name against a set of glob patterns (fnmatch syntax, case-sensitive).
+    Literal patterns ('build'), literal suffixes ('*.tmp') and literal prefixes
+    ('build*') are checked with set lookups and str.endswith/startswith, all
+    other patterns are compiled into a single regex alternation. Thus each name
+    is scanned once, regardless of the number of patterns. """
+
+    __slots__ = ('patterns', '_literals', '_suffixes', '_prefixes', '_regex')
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = tuple(patterns)
+        literals, suffixes, prefixes, regex_parts = set(), [], [], []
+        for pattern in self.patterns:
+            if not _MAGIC.search(pattern):
+                literals.add(pattern)
+            elif pattern.startswith('*') and not _MAGIC.search(pattern, 1):
+                suffixes.append(pattern[1:])
+            elif pattern.endswith('*') and not _MAGIC.search(pattern[:-1]):
+                prefixes.append(pattern[:-1])
+            else:
+                regex_parts.append(f'(?:{fnmatch.translate(pattern)})')
+        self._literals = frozenset(literals)
+        self._suffixes = tuple(suffixes)
+        self._prefixes = tuple(prefixes)
+        self._regex = re.compile('|'.join(regex_parts)).match if regex_parts else None
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self.patterns)!r})'
+
+    def __call__(self, name: str) -> bool:
+        """ True if the name matches at least one of the patterns. """
+        if name in self._literals:
+            return True
+        if self._suffixes and name.endswith(self._suffixes):
+            return True
+        if self._prefixes and name.startswith(self._prefixes):
+            return True
+        return self._regex is not None and self._regex(name) is not None
@@ -0,0 +1,98 @@
+"""path store
+==========
+compact storage of many paths as a tree of nodes: every node keeps the index of
+its parent and its (interned) name, full paths are only built on demand
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# parent index of top-level nodes
+NO_PARENT = -1
+
+
+class PathStore:
+    """ arena of path nodes. A path is split at '/' and each component becomes a
+    node, so a dir shared by many paths is stored once and equal names share one
+    string. Absolute paths start with a node named ''. Building a path from its
+    node is lossless: store.path(store.add(p)) == p. """
+
+    def __init__(self):
+        self._parents = array('l')
+        self._names: List[str] = []
+        # parent node -> name -> node
+        self._children: Dict[int, Dict[str, int]] = {}
+        # the walker yields the entries of a dir one after another, so the node of
+        # the last parent dir is reused without splitting its path again
+        self._last_dir = None
+        self._last_dir_node = NO_PARENT
+        self._path_cache: Tuple[int, str] = (NO_PARENT, '')
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, path: str) -> int:
+        """ the node of path, created with its missing parents if it isn't stored yet. """
+        dir_path, sep, name = path.rpartition('/')
+        if not sep:
+            return self._node(NO_PARENT, name)
+        if dir_path != self._last_dir:
+            parent = NO_PARENT
+            for component in dir_path.split('/'):
+                parent = self._node(parent, component)
+            self._last_dir, self._last_dir_node = dir_path, parent
+        return self._node(self._last_dir_node, name)
+
+    def find(self, path: str) -> Optional[int]:
+        """ the node of path, None if it isn't stored. """
+        node = NO_PARENT
+        for component in path.split('/'):
+            children = self._children.get(node)
+            node = children.get(component) if children is not None else None
+            if node is None:
+                return None
+        return node
+
+    def parent(self, node: int) -> int:
+        return self._parents[node]
+
+    def name(self, node: int) -> str:
+        return self._names[node]
+
+    def path(self, node: int) -> str:
+        """ builds the full path of a node. """
+        parent = self._parents[node]
+        if parent == NO_PARENT:
+            return self._names[node]
+        return f'{self.dir_path(parent)}/{self._names[node]}'
+
+    def dir_path(self, node: int) -> str:
+        """ like path(), the path of the last requested dir is cached, so building the
+        paths of the entries of one dir climbs the tree only once. """
+        cached_node, cached_path = self._path_cache
+        if node == cached_node:
+            return cached_path
+        names = []
+        current = node
+        while current != NO_PARENT:
+            names.append(self._names[current])
+            current = self._parents[current]
+        path = '/'.join(reversed(names))
+        self._path_cache = (node, path)
+        return path
+
+    def _node(self, parent: int, name: str) -> int:
+        children = self._children.get(parent)
+        if children is None:
+            children = self._children[parent] = {}
+        node = children.get(name)
+        if node is None:
+            node = len(self._names)
+            name = sys.intern(name)
+            self._parents.append(parent)
+            self._names.append(name)
+            children[name] = node
+        return node
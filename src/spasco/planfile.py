@@ -0,0 +1,112 @@
+"""plan files
+==========
+rename plans serialized as NUL-delimited records, so they can be reviewed and
+applied later without walking the tree again
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import os
+from typing import BinaryIO, Iterator, Tuple
+
+from .planner import RenameOp, RenamePlan, is_valid_name
+
+MAGIC = b'spasco-plan'
+VERSION = 1
+# size of the chunks read from a plan file
+READ_SIZE = 1 << 16
+
+# file layout:
+#   header:  b'spasco-plan 1 <number of ops>\n' <base dir> NUL
+#   records: <depth> NUL <d|f> NUL <src> NUL <new name> NUL    (deepest first)
+# src is relative to the base dir (the cwd of the run which created the plan).
+
+
+class PlanFileError(ValueError):
+    """ raised if a file is not a valid plan file. """
+
+
+def write_plan(plan: RenamePlan, fp: BinaryIO, base_dir: str = '') -> int:
+    """ writes all ops of the plan in execution order.
+
+    :argument
+      plan: RenamePlan
+      fp: file opened in binary mode
+      base_dir (optional): dir the paths of the plan are relative to, default is the cwd
+
+    :returns
+      number of written ops
+    """
+    fp.write(b'%s %d %d\n' % (MAGIC, VERSION, len(plan)))
+    fp.write(os.fsencode(base_dir or os.getcwd()) + b'\0')
+    encode = os.fsencode
+    batch = []
+    for op in plan:
+        new_name = op.dst[op.dst.rfind('/') + 1:]
+        batch.append(b'%d\0%s\0%s\0%s\0' % (op.depth, b'd' if op.is_dir else b'f', encode(op.src), encode(new_name)))
+        if len(batch) == 4096:
+            fp.write(b''.join(batch))
+            batch.clear()
+    fp.write(b''.join(batch))
+    return len(plan)
+
+
+def read_plan(fp: BinaryIO) -> Tuple[str, RenamePlan]:
+    """ reads a plan written by write_plan. Relative paths are resolved against the
+    base dir stored in the header, so the plan can be applied from any cwd.
+
+    :argument
+      fp: file opened in binary mode
+
+    :returns
+      base dir and RenamePlan
+    """
+    header = fp.readline()
+    try:
+        magic, version, count = header.split()
+        version, count = int(version), int(count)
+    except ValueError:
+        raise PlanFileError('not a spasco plan file') from None
+    if magic != MAGIC:
+        raise PlanFileError('not a spasco plan file')
+    if version != VERSION:
+        raise PlanFileError(f'unsupported plan file version {version}')
+
+    fields = iter_nul_delimited(fp)
+    base_dir = os.fsdecode(next(fields, b''))
+    prefix = base_dir.rstrip('/') + '/'
+    ops = []
+    decode = os.fsdecode
+    for depth, kind, src, new_name in zip(fields, fields, fields, fields):
+        src = decode(src)
+        if not src.startswith('/'):
+            src = prefix + src
+        try:
+            depth = int(depth)
+        except ValueError:
+            raise PlanFileError(f'invalid record for {src!r}') from None
+        if kind not in (b'd', b'f'):
+            raise PlanFileError(f'invalid record for {src!r}')
+        new_name = decode(new_name)
+        if not is_valid_name(new_name):
+            raise PlanFileError(f'invalid new name {new_name!r} for {src!r}')
+        dst = src[:src.rfind('/') + 1] + new_name
+        ops.append(RenameOp(src, dst, depth, kind == b'd'))
+    if len(ops) != count:
+        raise PlanFileError(f'plan file is truncated ({len(ops)} of {count} renamings)')
+    return base_dir, RenamePlan(ops)
+
+
+def iter_nul_delimited(fp: BinaryIO) -> Iterator[bytes]:
+    """ lazily yields the NUL-terminated fields of a binary stream, reading it in
+    chunks. A trailing field without terminating NUL is yielded as well. """
+    rest = b''
+    while True:
+        chunk = fp.read(READ_SIZE)
+        if not chunk:
+            break
+        fields = (rest + chunk).split(b'\0')
+        rest = fields.pop()
+        yield from fields
+    if rest:
+        yield rest
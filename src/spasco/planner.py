@@ -0,0 +1,220 @@
+"""rename planner
+==============
+computes the targets of all renamings and detects conflicts before anything
+is touched on disk
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import os
+import sys
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .pathstore import NO_PARENT, PathStore
+from .syscalls import syscalls
+from .walker import PathEntry
+
+
+class RenameOp:
+    """ a single renaming: src is renamed to dst within the same directory. When the
+    op is executed the parent dirs still have their old names (deepest paths are
+    renamed first). """
+
+    __slots__ = ('src', 'dst', 'depth', 'is_dir')
+
+    def __init__(self, src: str, dst: str, depth: int, is_dir: bool = False):
+        self.src = src
+        self.dst = dst
+        self.depth = depth
+        self.is_dir = is_dir
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.src!r} --> {self.dst!r})'
+
+
+class Conflict(NamedTuple):
+    """ a renaming which would overwrite something. """
+    target: str  # path of the target after all renamings are done
+    sources: Tuple[str, ...]
+    reason: str
+
+
+COLLISION = 'renamed to the same name'
+EXISTS = 'target already exists'
+
+
+class InvalidNameError(ValueError):
+    """ the new name of a file/dir is empty, '.', '..' or contains a '/' or a NUL
+    byte. Files/dirs are only renamed, never moved. """
+
+    def __init__(self, path: str, name: str):
+        super().__init__(f'{path!r} cannot be renamed to {name!r}: not a valid file/dir name')
+        self.path = path
+        self.name = name
+
+
+class RenamePlan:
+    """ all renamings of a run and an index of their final target paths. The ops
+    are scheduled in depth buckets: deeper paths are renamed first, so the parent
+    dirs of an op still have their old names when it's executed.
+
+    The sources are kept in a PathStore and each op only as its node and new name,
+    so the memory scales with the number of unique names. RenameOp objects with
+    full paths are built when the plan is iterated. Duplicate ops are skipped. """
+
+    def __init__(self, ops: Iterable[RenameOp]):
+        self._store = store = PathStore()
+        self._buckets: Dict[int, array] = {}
+        # indexed by node, None/0 for the nodes of parent dirs which aren't renamed
+        self._new_names: List[Optional[str]] = []
+        self._is_dir = bytearray()
+        self._count = 0
+        for op in ops:
+            node = store.add(op.src)
+            missing = len(store) - len(self._new_names)
+            if missing:
+                self._new_names.extend([None] * missing)
+                self._is_dir.extend(bytes(missing))
+            elif self._new_names[node] is not None:
+                continue
+            new_name = op.dst[op.dst.rfind('/') + 1:]
+            # renamings never move a file/dir, see rename_ops()
+            assert op.dst[:len(op.dst) - len(new_name)] == op.src[:len(op.src) - len(store.name(node))], op
+            self._new_names[node] = sys.intern(new_name)
+            self._is_dir[node] = op.is_dir
+            self._count += 1
+            bucket = self._buckets.get(op.depth)
+            if bucket is None:
+                bucket = self._buckets[op.depth] = array('l')
+            bucket.append(node)
+        self._final_dirs: Dict[int, str] = {}
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self) -> Iterator[RenameOp]:
+        """ all ops in the order they are executed (deepest first). """
+        for _, ops in self.depth_buckets():
+            yield from ops
+
+    def depth_buckets(self) -> List[Tuple[int, 'OpBucket']]:
+        """ the ops grouped by depth, deepest first. All ops of a bucket are independent
+        of each other (they rename different entries of dirs which aren't renamed
+        before the next bucket), so they can be executed in any order. """
+        return [(depth, OpBucket(self, depth, nodes)) for depth, nodes in sorted(self._buckets.items(), reverse=True)]
+
+    def final_path(self, path: str) -> str:
+        """ location of path once all renamings of the plan are done. Every parent
+        dir is resolved only once, so this is linear in the size of the plan. """
+        node = self._store.find(path)
+        if node is None:
+            # not below a renamed dir: the longest stored parent is resolved
+            dir_path, sep, name = path.rpartition('/')
+            return f'{self.final_path(dir_path)}{sep}{name}' if sep and dir_path else path
+        return self._final_path(node)
+
+    def conflicts(self, check_disk: bool = True) -> List[Conflict]:
+        """ detects renamings into the same target and renamings overwriting existing
+        files/dirs. Uses a hash index of the targets (parent node and new name), so
+        it's linear in the number of ops.
+
+        :argument
+          check_disk: if true, every target is looked up on disk (one lstat per op)
+
+        :returns
+          list of conflicts, empty if the plan is safe to execute
+        """
+        store = self._store
+        targets: Dict[Tuple[int, str], List[int]] = {}
+        for node, new_name in enumerate(self._new_names):
+            if new_name is not None:
+                targets.setdefault((store.parent(node), new_name), []).append(node)
+        conflicts = [Conflict(self._final_path(nodes[0]), tuple(store.path(node) for node in nodes), COLLISION)
+                     for nodes in targets.values() if len(nodes) > 1]
+        if check_disk:
+            conflicts.extend(Conflict(self.final_path(op.src), (op.src,), EXISTS)
+                             for op in self if os.path.lexists(op.dst))
+            syscalls.add('lstat', self._count)
+        return conflicts
+
+    def _op(self, node: int, depth: int) -> RenameOp:
+        store = self._store
+        parent = store.parent(node)
+        prefix = '' if parent == NO_PARENT else store.dir_path(parent) + '/'
+        return RenameOp(prefix + store.name(node), prefix + self._new_names[node], depth, bool(self._is_dir[node]))
+
+    def _final_path(self, node: int) -> str:
+        store = self._store
+        name = self._new_names[node] or store.name(node)
+        parent = store.parent(node)
+        if parent == NO_PARENT:
+            return name
+        final_dirs = self._final_dirs
+        # climb up until a parent with a known final path (or the top) is reached ...
+        pending = []
+        while parent != NO_PARENT and parent not in final_dirs:
+            pending.append(parent)
+            parent = store.parent(parent)
+        base = final_dirs[parent] if parent != NO_PARENT else None
+        # ... and build the final paths of the parents top-down
+        for parent in reversed(pending):
+            parent_name = self._new_names[parent] or store.name(parent)
+            base = final_dirs[parent] = parent_name if base is None else f'{base}/{parent_name}'
+        return f'{base}/{name}'
+
+
+class OpBucket(Sequence):
+    """ the ops of one depth, built from the path store when they are accessed. """
+
+    def __init__(self, plan: RenamePlan, depth: int, nodes: array):
+        self._plan = plan
+        self._depth = depth
+        self._nodes = nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._plan._op(node, self._depth) for node in self._nodes[index]]
+        return self._plan._op(self._nodes[index], self._depth)
+
+    def __iter__(self) -> Iterator[RenameOp]:
+        for node in self._nodes:
+            yield self._plan._op(node, self._depth)
+
+
+def is_valid_name(name: str) -> bool:
+    """ false for names which can't be given to a file/dir by renaming it in place. """
+    return name not in ('', '.', '..') and '/' not in name and '\0' not in name
+
+
+def plan_renames(entries: Iterable[PathEntry], new_name: Callable[[str], str]) -> RenamePlan:
+    """ computes the target of each entry, entries whose name doesn't change are skipped.
+
+    :argument
+      entries: files/dirs to be renamed in any order, they are scheduled by their depth
+      new_name: maps the old name of a file/dir to its new name
+
+    :returns
+      RenamePlan
+    """
+    return RenamePlan(rename_ops(entries, new_name))
+
+
+def rename_ops(entries: Iterable[PathEntry], new_name: Callable[[str], str]) -> Iterator[RenameOp]:
+    """ lazily yields an op for each entry whose name changes. Duplicates are skipped
+    by RenamePlan.
+
+    :raises
+      InvalidNameError: a new name isn't a valid file name, e.g. contains a '/'
+    """
+    for entry in entries:
+        name = new_name(entry.name)
+        if name == entry.name:
+            continue
+        if not is_valid_name(name):
+            raise InvalidNameError(entry.path, name)
+        parent = entry.path[:len(entry.path) - len(entry.name)]
+        yield RenameOp(entry.path, parent + name, entry.depth, entry.is_dir)
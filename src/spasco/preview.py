@@ -0,0 +1,131 @@
+"""rename preview
+==============
+renders the before/after table of a rename plan
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import contextlib
+import itertools
+import os
+import subprocess
+import sys
+import time
+from typing import Iterable, Iterator, Optional, TextIO
+
+from .planner import RenameOp, RenamePlan
+from .walker import PathEntry
+
+# number of lines joined into a single write call
+BATCH_SIZE = 4096
+
+
+def render_preview(plan: RenamePlan, stream: Optional[TextIO] = None, limit: Optional[int] = None) -> None:
+    """ writes the before/after table of all renamings. The column width is computed
+    once and the lines are written in batches.
+
+    :argument
+      plan: RenamePlan, rows are written in execution order (deepest first)
+      stream (optional): file-like object, default is stdout
+      limit (optional): only the first rows are written, followed by a summary of
+            the remaining renamings
+    """
+    stream = stream or sys.stdout
+    total = len(plan)
+    shown = total if limit is None else min(max(limit, 0), total)
+    width = max((len(op.src) for op in itertools.islice(plan, shown)), default=0)
+
+    stream.write(f'{total} files/directories can be renamed:\n')
+    stream.write(f"before {' ' * (width - len('before') + 6)} after\n")
+    batch = []
+    for op in itertools.islice(plan, shown):
+        batch.append(f"{op.src!r}{' ' * (width - len(op.src))} --> {op.dst!r}")
+        if len(batch) == BATCH_SIZE:
+            stream.write('\n'.join(batch) + '\n')
+            batch.clear()
+    if batch:
+        stream.write('\n'.join(batch) + '\n')
+
+    if shown < total:
+        dircount = sum(1 for op in itertools.islice(plan, shown, None) if op.is_dir)
+        stream.write(f'... {total - shown} more not shown ({total - shown - dircount} files, {dircount} directories)\n')
+    stream.flush()
+
+
+@contextlib.contextmanager
+def pager() -> Iterator[TextIO]:
+    """ yields a stream piped into the user's pager ($PAGER, default: less), or stdout
+    if stdout is no terminal. Returns when the pager was closed. """
+    if not sys.stdout.isatty():
+        yield sys.stdout
+        return
+    process = subprocess.Popen(os.environ.get('PAGER') or 'less', shell=True,
+                               stdin=subprocess.PIPE, universal_newlines=True)
+    try:
+        yield process.stdin
+    except BrokenPipeError:  # the pager was quit before everything was written
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+
+
+class LiveProgress:
+    """ streams the renamings to the terminal while the tree is still being walked,
+    together with a counter of the scanned and matched entries. The counter is
+    redrawn in place if the status stream is a terminal (at most every interval
+    seconds), otherwise the counts are only written once at the end. """
+
+    def __init__(self, stream: Optional[TextIO] = None, status: Optional[TextIO] = None, interval: float = 0.1):
+        self.stream = stream or sys.stdout
+        self.status = status or sys.stderr
+        self.interval = interval
+        self.scanned = 0
+        self.matched = 0
+        self._live = self.status.isatty()
+        self._drawn = False
+        self._last_draw = 0.0
+
+    def count_scanned(self, entries: Iterable[PathEntry]) -> Iterator[PathEntry]:
+        """ passes the entries through and counts them. """
+        for entry in entries:
+            self.scanned += 1
+            if self._live and not self.scanned & 0xff:
+                self._draw()
+            yield entry
+
+    def show_matched(self, ops: Iterable[RenameOp]) -> Iterator[RenameOp]:
+        """ passes the ops through and writes each of them as soon as it's found. """
+        for op in ops:
+            self.matched += 1
+            self._clear()
+            self.stream.write(f'{op.src!r} --> {op.dst!r}\n')
+            if self._live:
+                self._draw()
+            yield op
+
+    def close(self) -> None:
+        """ writes the final counts. """
+        self._clear()
+        self.stream.flush()
+        self.status.write(f'scanned: {self.scanned}  matched: {self.matched}\n')
+        self.status.flush()
+
+    def _draw(self) -> None:
+        now = time.monotonic()
+        if now - self._last_draw < self.interval:
+            return
+        self._last_draw = now
+        self.stream.flush()
+        self.status.write(f'\rscanned: {self.scanned}  matched: {self.matched}')
+        self.status.flush()
+        self._drawn = True
+
+    def _clear(self) -> None:
+        if self._drawn:
+            self.status.write('\r\033[K')
+            self.status.flush()
+            self._drawn = False
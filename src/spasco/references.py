@@ -0,0 +1,166 @@
+"""reference rewriting
+===================
+updates the paths of renamed files/dirs within text files (Makefiles, manifests,
+configs, ...). The files are scanned memory-mapped with a single regex matching
+all renamed paths at once, only files containing one of them are rewritten.
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import glob
+import mmap
+import os
+import re
+import tempfile
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+# a path only matches if it isn't part of a longer name or path, e.g. 'a b'
+# doesn't match within 'data b', 'a b.txt' or 'vendor/a b' (which wasn't
+# renamed). Relative paths are also matched with a './' prefix and with the
+# absolute path of the cwd. The char before a match is checked separately: a
+# lookbehind would disable the fast search for the first chars and make the
+# scan CPU-bound.
+_NAME_CHAR = re.compile(rb'[\w./-]')
+_AFTER = rb'(?![\w.-])'
+
+
+class ReferenceUpdate(NamedTuple):
+    """ outcome of scanning a single file, error is None if it succeeded. """
+    path: str
+    replaced: int
+    error: Optional[OSError] = None
+
+
+class ReferenceRewriter:
+    """ replaces the old paths of renamed files/dirs by their new ones. A reference
+    to a path below a renamed dir is updated by replacing the dir's path, so only
+    one pair per renaming is needed. """
+
+    def __init__(self, renamed: Iterable[Tuple[str, str]], base_dir: str = ''):
+        """ :argument
+          renamed: (old path, new path) pairs
+          base_dir: dir the relative paths are relative to, the cwd by default
+
+        :raises
+          ValueError: the paths cannot be compiled into a regex (too deeply nested)
+        """
+        prefixes = (b'', b'./', os.fsencode(base_dir or os.getcwd()).rstrip(b'/') + b'/')
+        self._new_paths: Dict[bytes, bytes] = {}
+        self._count = 0
+        for old, new in renamed:
+            if old == new:
+                continue
+            old, new = os.fsencode(old), os.fsencode(new)
+            self._count += 1
+            if old.startswith(b'/'):
+                self._new_paths[old] = new
+                continue
+            if old.startswith(b'./') and new.startswith(b'./'):
+                old, new = old[2:], new[2:]
+            for prefix in prefixes:
+                self._new_paths[prefix + old] = prefix + new
+        self._pattern = None
+        if self._new_paths:
+            try:
+                self._pattern = re.compile(_trie_pattern(self._new_paths) + _AFTER)
+            except (re.error, RecursionError, OverflowError) as e:
+                raise ValueError(f'the renamed paths cannot be matched: {e}') from e
+
+    def __len__(self):
+        return self._count
+
+    def rewrite(self, path: str) -> ReferenceUpdate:
+        """ scans the file and replaces it atomically (same permissions, via a temporary
+        file in the same dir) if it contains references. """
+        if self._pattern is None:
+            return ReferenceUpdate(path, 0)
+        try:
+            with open(path, 'rb') as fp:
+                if os.fstat(fp.fileno()).st_size == 0:
+                    return ReferenceUpdate(path, 0)
+                with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    pieces, end = [], 0
+                    for match in self._references(data):
+                        pieces.append(data[end:match.start()])
+                        pieces.append(self._new_paths[match.group()])
+                        end = match.end()
+                    if not pieces:
+                        return ReferenceUpdate(path, 0)
+                    pieces.append(data[end:])
+            _replace_file(path, b''.join(pieces))
+        except OSError as e:
+            return ReferenceUpdate(path, 0, e)
+        return ReferenceUpdate(path, len(pieces) // 2)
+
+    def _references(self, data) -> Iterator['re.Match']:
+        name_char = _NAME_CHAR.match
+        for match in self._pattern.finditer(data):
+            start = match.start()
+            if start == 0 or name_char(data, start - 1) is None:
+                yield match
+
+    def rewrite_all(self, paths: Iterable[str]) -> Iterator[ReferenceUpdate]:
+        for path in paths:
+            yield self.rewrite(path)
+
+
+def reference_files(patterns: Sequence[str]) -> Iterator[str]:
+    """ the regular files matching the globs ('**' matches any number of dirs),
+    each of them once. """
+    seen = set()
+    for pattern in patterns:
+        for path in glob.iglob(pattern, recursive=True):
+            if path not in seen and os.path.isfile(path) and not os.path.islink(path):
+                seen.add(path)
+                yield path
+
+
+def _trie_pattern(words: Iterable[bytes]) -> bytes:
+    """ a regex matching the longest of the words. The words are merged into a trie,
+    so the alternatives are tried per character instead of per word and the regex
+    stays fast with many thousands of words. The trie is written out with an
+    explicit stack, paths may be thousands of bytes long. """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for byte in word:
+            node = node.setdefault(byte, {})
+        node[None] = True
+    parts = []
+    # nodes still to be written out and literal parts of the regex, in reverse order
+    stack: list = [trie]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, bytes):
+            parts.append(item)
+            continue
+        branches = [(byte, child) for byte, child in item.items() if byte is not None]
+        if not branches:
+            continue
+        # the regex is greedy, so a longer word is preferred over one ending here
+        is_end = None in item
+        grouped = is_end or len(branches) > 1
+        pending: list = [b'(?:'] if grouped else []
+        for i, (byte, child) in enumerate(branches):
+            if i:
+                pending.append(b'|')
+            pending.append(re.escape(bytes([byte])))
+            pending.append(child)
+        if grouped:
+            pending.append(b')?' if is_end else b')')
+        stack.extend(reversed(pending))
+    return b''.join(parts)
+
+
+def _replace_file(path: str, content: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(prefix='.spasco-', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
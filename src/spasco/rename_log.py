@@ -0,0 +1,118 @@
+"""rename log
+==========
+non-blocking log record of the renamings: records are passed through a queue to
+a background thread which writes them in batches to a size-rotated log file
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import contextlib
+import logging
+import os
+import logging.handlers
+import queue
+from typing import Iterator, Optional
+
+LOG_FORMAT = '%(levelname)s | %(asctime)s | %(message)s'
+# the log file is rotated once it exceeds MAX_BYTES, BACKUP_COUNT old files are kept
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 3
+# the writer thread flushes the file after this many records (and when stopped)
+FLUSH_EVERY = 1000
+
+logger = logging.getLogger('spasco.renaming')
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """ RotatingFileHandler which flushes its stream only every flush_every records
+    instead of after each record. The size of the log file is counted by the
+    handler: RotatingFileHandler seeks to the end of the file (which flushes it)
+    and stats it for every record. """
+
+    def __init__(self, filename: str, flush_every: int = FLUSH_EVERY, **kwargs):
+        self._size = 0
+        super().__init__(filename, **kwargs)
+        self.flush_every = flush_every
+        self._pending = 0
+
+    def _open(self):
+        stream = super()._open()
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = self.format(record) + self.terminator
+            size = len(message.encode(self.encoding or 'utf-8', 'replace'))
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size and self._size + size >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(message)
+            self._size += size
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        size = len((self.format(record) + self.terminator).encode(self.encoding or 'utf-8', 'replace'))
+        return self.maxBytes > 0 and self._size > 0 and self._size + size >= self.maxBytes
+
+    def flush(self) -> None:
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.force_flush()
+
+    def force_flush(self) -> None:
+        self._pending = 0
+        super().flush()
+
+    def close(self) -> None:
+        self.force_flush()
+        super().close()
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """ puts records on the queue unformatted: the message is formatted by the
+    writer thread, not by the renaming thread. """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+@contextlib.contextmanager
+def rename_logging(log_path: Optional[str], max_bytes: int = MAX_BYTES,
+                   backup_count: int = BACKUP_COUNT) -> Iterator[logging.Logger]:
+    """ routes the records of the renaming logger to a log file while the context is
+    active. Without a log path the records are dropped.
+
+    :argument
+      log_path (optional): log file, None if logging is turned off
+      max_bytes, backup_count: size-based rotation of the log file
+
+    :returns
+      the renaming logger
+    """
+    if not log_path:
+        logger.setLevel(logging.WARNING)
+        yield logger
+        return
+    handler = BatchingRotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records: queue.Queue = queue.Queue()
+    listener = logging.handlers.QueueListener(records, handler)
+    queue_handler = _RecordQueueHandler(records)
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    try:
+        yield logger
+    finally:
+        logger.removeHandler(queue_handler)
+        logger.setLevel(logging.WARNING)
+        listener.stop()
+        handler.close()
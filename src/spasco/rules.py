@@ -0,0 +1,139 @@
+"""replacement rules
+=================
+several search-value --> new-value rules applied to a name in a single pass, or
+a regular expression with a replacement template
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import functools
+import re
+from typing import Dict, Iterable, List, Pattern, Tuple
+
+Rule = Tuple[str, str]
+
+
+class RuleSet:
+    """ applies all rules to a name at once, each character of the name is replaced
+    by at most one rule. Single-character rules are compiled into one str.translate
+    table, multi-character rules into one regex alternation (longer search-values
+    first), which takes precedence where both match. A single rule is applied with
+    str.replace. A later rule with the same search-value overrides an earlier one. """
+
+    def __init__(self, rules: Iterable[Rule]):
+        rules = dict(rules)
+        if not rules or '' in rules:
+            raise ValueError('rules need a non-empty search-value')
+        self.rules: List[Rule] = list(rules.items())
+        self._table: Dict[int, str] = {ord(old): new for old, new in rules.items() if len(old) == 1}
+        self._chars = frozenset(old for old in rules if len(old) == 1)
+        self._multi = {old: new for old, new in rules.items() if len(old) > 1}
+        self._pattern = None
+        if self._multi:
+            self._pattern = re.compile('|'.join(map(re.escape, sorted(self._multi, key=len, reverse=True))))
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.rules!r})'
+
+    def __str__(self):
+        return ', '.join(f'{old!r} by {new!r}' for old, new in self.rules)
+
+    def describe_search(self) -> str:
+        if len(self.rules) == 1:
+            return f'the search-value {self.rules[0][0]!r}'
+        return f'a search-value of the rules {self}'
+
+    def search(self, name: str) -> bool:
+        """ true if at least one rule changes the name. """
+        if len(self.rules) == 1:
+            return self.rules[0][0] in name
+        if self._pattern is not None and self._pattern.search(name):
+            return True
+        return not self._chars.isdisjoint(name)
+
+    def __call__(self, name: str) -> str:
+        """ the name with all rules applied. """
+        if len(self.rules) == 1:
+            old, new = self.rules[0]
+            return name.replace(old, new)
+        if self._pattern is None:
+            return name.translate(self._table)
+        parts = []
+        pos = 0
+        for match in self._pattern.finditer(name):
+            parts.append(name[pos:match.start()].translate(self._table))
+            parts.append(self._multi[match.group()])
+            pos = match.end()
+        parts.append(name[pos:].translate(self._table))
+        return ''.join(parts)
+
+
+class RegexRule:
+    """ replaces the matches of a regular expression, the replacement can refer to
+    groups (e.g. \\1 or \\g<name>). Has the interface of RuleSet. """
+
+    def __init__(self, pattern: str, replacement: str):
+        self.pattern = compile_pattern(pattern)
+        self.replacement = replacement
+        self.rules: List[Rule] = [(pattern, replacement)]
+        self.search_pattern = self.pattern.search
+
+    def __len__(self):
+        return 1
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.pattern.pattern!r}, {self.replacement!r})'
+
+    def __str__(self):
+        return f'{self.pattern.pattern!r} by {self.replacement!r}'
+
+    def describe_search(self) -> str:
+        return f'a match of the pattern {self.pattern.pattern!r}'
+
+    def search(self, name: str) -> bool:
+        """ true if the pattern matches somewhere in the name. """
+        return self.search_pattern(name) is not None
+
+    def __call__(self, name: str) -> str:
+        return self.pattern.sub(self.replacement, name)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_pattern(pattern: str) -> Pattern:
+    """ compiles a pattern once, e.g. the search-value of the config which is used
+    by every run of a watch or a library caller. """
+    return re.compile(pattern)
+
+
+def parse_rule(text: str) -> Rule:
+    """ parses 'OLD=NEW', split at the first '='. A side wrapped in single quotes is
+    unquoted, so e.g. "' '=_" can be written where whitespace would be stripped. """
+    old, sep, new = text.partition('=')
+    if not sep or not old:
+        raise ValueError(f'invalid rule {text!r}, expected OLD=NEW')
+    return _unquote(old), _unquote(new)
+
+
+def format_rule(rule: Rule) -> str:
+    """ the inverse of parse_rule(). """
+    return '='.join(_quote(value) for value in rule)
+
+
+def parse_rules(text: str) -> List[Rule]:
+    """ parses one rule per line, blank lines are skipped. """
+    return [parse_rule(line) for line in text.splitlines() if line.strip()]
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    return value
+
+
+def _quote(value: str) -> str:
+    if value != value.strip() or (value[:1] == value[-1:] == "'"):
+        return f"'{value}'"
+    return value
@@ -0,0 +1,175 @@
+"""run statistics
+==============
+wall time, entry counts and kernel-side costs of the stages of a run, and the
+optional cProfile/tracemalloc report
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import contextlib
+import json
+import resource
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, TypeVar
+
+from .syscalls import syscalls
+
+T = TypeVar('T')
+
+
+class StageStats:
+    """ measurements of a single stage. items counts what the stage yielded (e.g.
+    the entries which passed a filter), items_in what it was fed with. sys_seconds
+    is the kernel CPU time and syscalls the number of file system calls (scandir,
+    stat, lstat, open, rename, ...) of the stage, as counted by the modules making
+    them. The streamed walk, filter and plan stages only do syscalls while
+    walking, so their kernel costs are attributed to the walk. """
+
+    __slots__ = ('name', 'seconds', 'items_in', 'items', 'sys_seconds', 'syscalls')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.items_in: Optional[int] = None
+        self.items = 0
+        self.sys_seconds: Optional[float] = None
+        self.syscalls: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class RunStats:
+    """ collects the stages of a run in the order they were started. Streamed
+    stages are chained: each of them gets the time spent in it minus the time
+    spent in its upstream stage. """
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        # time including the upstream stages, for the streamed stages
+        self._inclusive: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def stage(self, name: str) -> StageStats:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats(name)
+        return stage
+
+    @contextlib.contextmanager
+    def measure(self, name: str, upstream: Optional[str] = None,
+                kernel_stage: Optional[str] = None) -> Iterator[StageStats]:
+        """ measures a stage running as a block, the caller sets its items.
+
+        :argument
+          upstream (optional): streamed stage consumed by the block, its inclusive
+                time is subtracted
+          kernel_stage (optional): stage the kernel costs are attributed to
+        """
+        stage = self.stage(name)
+        kernel = self.stage(kernel_stage) if kernel_stage else stage
+        sys_start, syscalls_start = _sys_time(), syscalls.total()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            seconds = time.perf_counter() - start
+            self._inclusive[name] = self._inclusive.get(name, 0.0) + seconds
+            stage.seconds += seconds - (self._inclusive.get(upstream, 0.0) if upstream else 0.0)
+            kernel.sys_seconds = (kernel.sys_seconds or 0.0) + _sys_time() - sys_start
+            kernel.syscalls = (kernel.syscalls or 0) + syscalls.total() - syscalls_start
+
+    def iterate(self, name: str, items: Iterable[T], upstream: Optional[str] = None) -> Iterator[T]:
+        """ passes the items of a streamed stage through, counting them and timing the
+        calls for the next item. """
+        stage = self.stage(name)
+        self._inclusive.setdefault(name, 0.0)
+        return self._iterate(stage, iter(items), upstream)
+
+    def _iterate(self, stage: StageStats, iterator: Iterator[T], upstream: Optional[str]) -> Iterator[T]:
+        inclusive = self._inclusive
+        name = stage.name
+        clock = time.perf_counter
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    inclusive[name] += clock() - start
+                stage.items += 1
+                yield item
+        finally:
+            stage.seconds = inclusive[name] - (inclusive.get(upstream, 0.0) if upstream else 0.0)
+
+    def timed(self, name: str, func: Callable[..., T]) -> Callable[..., T]:
+        """ wraps a function (e.g. a filter predicate) so the time spent in it is added
+        to the stage. """
+        stage = self.stage(name)
+        clock = time.perf_counter
+
+        def timed_func(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                stage.seconds += clock() - start
+        return timed_func
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._started
+
+    def as_dict(self) -> dict:
+        return {'total_seconds': self.total_seconds, 'stages': [stage.as_dict() for stage in self.stages.values()],
+                'syscalls': syscalls.as_dict()}
+
+    def write(self, stream: TextIO, format: str = 'text') -> None:
+        """ writes the summary as an aligned table or as a single line of JSON. """
+        if format == 'json':
+            stream.write(json.dumps(self.as_dict()) + '\n')
+            return
+        lines = [f"{'stage':<24} {'seconds':>9} {'in':>9} {'out':>9} {'sys s':>7} {'fs calls':>9}"]
+        for stage in self.stages.values():
+            lines.append(f'{stage.name:<24} {stage.seconds:9.4f} {_optional(stage.items_in):>9} {stage.items:>9} '
+                         f"{_optional(stage.sys_seconds, '{:.3f}'):>7} {_optional(stage.syscalls):>9}")
+        lines.append(f"{'total':<24} {self.total_seconds:9.4f}")
+        stream.write('\n'.join(lines) + '\n')
+
+
+@contextlib.contextmanager
+def profiled(kind: str, stream: TextIO, limit: int = 25) -> Iterator[None]:
+    """ profiles the block with cProfile ('cpu') or tracemalloc ('memory') and writes
+    the top entries of the report to the stream. """
+    if kind == 'memory':
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            stream.write(f'peak memory: {peak / 1024 / 1024:.1f} MiB, top {limit} allocations:\n')
+            for statistic in snapshot.statistics('lineno')[:limit]:
+                stream.write(f'  {statistic}\n')
+        return
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+
+
+def _sys_time() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_stime
+
+
+def _optional(value, template: str = '{}') -> str:
+    return '-' if value is None else template.format(value)
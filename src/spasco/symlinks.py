@@ -0,0 +1,106 @@
+"""symlink retargeting
+===================
+repairs symlinks whose targets were renamed. Every link found during the walk
+is read once (without following it) and its target is looked up in a hash index
+of the renamed paths, only the affected links are recreated.
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import os
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .syscalls import syscalls
+
+
+class RetargetResult(NamedTuple):
+    """ a recreated symlink, error is None if it succeeded. """
+    path: str
+    old_target: str
+    new_target: str
+    error: Optional[OSError] = None
+
+
+class SymlinkRetargeter:
+    """ maps link targets to their new locations. The index holds the absolute old
+    path of every renamed file/dir, a target is resolved by looking up its path
+    and then its parent dirs, so each link costs one readlink and at most one
+    lookup per path component, independent of the number of renamings. """
+
+    def __init__(self, renamed: Iterable[Tuple[str, str]]):
+        self._new_paths: Dict[str, str] = {
+            os.path.abspath(old): os.path.abspath(new) for old, new in renamed if old != new
+        }
+
+    def __len__(self):
+        return len(self._new_paths)
+
+    def new_path(self, path: str) -> Optional[str]:
+        """ location of an absolute, normalized path after the renamings, None if
+        neither the path nor one of its parents was renamed. """
+        new_paths = self._new_paths
+        prefix, rest = path, ''
+        while prefix:
+            new_prefix = new_paths.get(prefix)
+            if new_prefix is not None:
+                return new_prefix + rest
+            prefix, sep, name = prefix.rpartition('/')
+            rest = sep + name + rest
+        return None
+
+    def retarget(self, old_link: str, link: str) -> Optional[RetargetResult]:
+        """ recreates the link atomically if its target was renamed. Relative targets
+        stay relative.
+
+        :argument
+          old_link: path of the link before the renamings, relative targets are
+                resolved from its dir
+          link: current path of the link
+
+        :returns
+          RetargetResult, None if the target wasn't renamed
+        """
+        syscalls.add('readlink')
+        try:
+            target = os.readlink(link)
+        except OSError as e:
+            return RetargetResult(link, '', '', e)
+        old_dir = os.path.dirname(os.path.abspath(old_link))
+        new_path = self.new_path(os.path.normpath(os.path.join(old_dir, target)))
+        if new_path is None:
+            return None
+        if os.path.isabs(target):
+            new_target = new_path
+        else:
+            new_target = os.path.relpath(new_path, os.path.dirname(os.path.abspath(link)))
+        if new_target == target:
+            return None
+        try:
+            _replace_symlink(new_target, link)
+        except OSError as e:
+            return RetargetResult(link, target, new_target, e)
+        return RetargetResult(link, target, new_target)
+
+    def retarget_all(self, links: Iterable[Tuple[str, str]]) -> Iterator[RetargetResult]:
+        """ retargets (old path, current path) links, yields the affected ones. """
+        if not self._new_paths:
+            return
+        for old_link, link in links:
+            result = self.retarget(old_link, link)
+            if result is not None:
+                yield result
+
+
+def _replace_symlink(target: str, path: str) -> None:
+    """ creates the new link next to the old one and moves it into its place, so the
+    link is never missing. """
+    dir_path, name = os.path.split(path)
+    tmp_path = os.path.join(dir_path, f'.{name}.{os.urandom(6).hex()}.spasco')
+    syscalls.add('symlink')
+    syscalls.add('rename')
+    os.symlink(target, tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
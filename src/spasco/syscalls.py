@@ -0,0 +1,34 @@
+"""syscall counts
+==============
+number of file system calls made by the walker, the dir index, the conflict
+check and the executor, counted where they are made (see --stats)
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import threading
+from typing import Dict
+
+
+class SyscallCounts:
+    """ counts per kind of call ('scandir', 'stat', 'lstat', 'open', 'rename').
+    Thread-safe, the parallel walk and renaming add from several threads. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def add(self, kind: str, count: int = 1) -> None:
+        with self._lock:
+            self._counts[kind] = self._counts.get(kind, 0) + count
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+syscalls = SyscallCounts()
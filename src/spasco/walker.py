@@ -0,0 +1,322 @@
+"""directory walker
+================
+streaming traversal of directory trees based on os.scandir
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import os
+import stat
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .dirindex import DIR, FILE, SYMLINK, DirIndex
+from .syscalls import syscalls
+
+# number of directory levels scanned serially to split a single big tree into subtrees
+_MAX_SPLIT_LEVELS = 3
+# entries passed from a worker of a parallel walk to the consumer at once, and the
+# number of chunks a worker may queue before it waits for the consumer
+_CHUNK_ENTRIES = 256
+_QUEUED_CHUNKS = 4
+
+
+class PathEntry:
+    """ lightweight file/dir entry yielded by the walker. The file type is taken
+    from the d_type cached by os.scandir, so no further stat call is needed. """
+
+    __slots__ = ('path', 'name', 'depth', '_is_dir', '_is_file', '_is_symlink')
+
+    def __init__(self, path: str, name: str, depth: int,
+                 is_dir: bool = False, is_file: bool = False, is_symlink: bool = False):
+        self.path = path
+        self.name = name
+        self.depth = depth
+        self._is_dir = is_dir
+        self._is_file = is_file
+        self._is_symlink = is_symlink
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r}, depth={self.depth})'
+
+    @property
+    def is_dir(self) -> bool:
+        if self._is_dir is None:
+            self._stat()
+        return self._is_dir
+
+    @property
+    def is_file(self) -> bool:
+        if self._is_file is None:
+            self._stat()
+        return self._is_file
+
+    @property
+    def is_symlink(self) -> bool:
+        if self._is_symlink is None:
+            self._stat()
+        return self._is_symlink
+
+    @classmethod
+    def from_path(cls, path: str) -> 'PathEntry':
+        """ creates an entry for a path which was not found by the walker (e.g. given
+        on the command line). The file type is determined when it's first accessed
+        (one lstat call, two for symlinks), so entries which are filtered out by
+        their name cost no syscall.
+
+        :argument
+          path: relative or absolute path of a file/dir
+
+        :returns
+          PathEntry, the depth is the number of path components.
+        """
+        path = os.path.normpath(path)
+        name = os.path.basename(path)
+        depth = path.count('/') + (0 if path.startswith('/') else 1)
+        return cls(path, name, depth, None, None, None)
+
+    def _stat(self) -> None:
+        self._is_dir = self._is_file = self._is_symlink = False
+        syscalls.add('lstat')
+        try:
+            st = os.lstat(self.path)
+        except OSError:
+            return
+        self._is_symlink = stat.S_ISLNK(st.st_mode)
+        if self._is_symlink:
+            syscalls.add('stat')
+            try:
+                st = os.stat(self.path)
+            except OSError:  # dangling symlink
+                return
+        self._is_dir, self._is_file = stat.S_ISDIR(st.st_mode), stat.S_ISREG(st.st_mode)
+
+
+class _Subtree(NamedTuple):
+    """ a directory which still has to be scanned, limits are inherited from its root. """
+    dir_path: str
+    prefix: str
+    depth: int
+    max_depth: Optional[int]  # deepest entry depth to be yielded
+    dev: Optional[int]  # device of the root if the walk stays on one file system
+    index: Optional[DirIndex]  # cached listings are used instead of reading the dirs
+
+
+def walk(root: str = '.', depth: int = 0, prune: Optional[Callable[[str], bool]] = None,
+         max_depth: Optional[int] = None, one_file_system: bool = False, jobs: int = 1,
+         index: Optional[DirIndex] = None) -> Iterator[PathEntry]:
+    """ yields all files and dirs below root while the tree is traversed.
+    Symlinked directories are listed but not followed.
+
+    :argument
+      root: directory to start from. Paths of the entries are relative to root if
+            root is the cwd ('.'), otherwise they are prefixed with root.
+      depth: depth of root itself, the direct children of root get depth + 1
+      prune (optional): called with the name of each directory, matching directories
+            are neither yielded nor opened
+      max_depth (optional): number of levels below root which are descended into
+      one_file_system: directories on other file systems (mount points) are yielded
+            but not descended into
+      jobs: number of threads scanning subtrees concurrently
+      index (optional): DirIndex, dirs whose mtime is unchanged aren't read again
+
+    :returns
+      generator of PathEntry objects, parents are yielded before their children.
+    """
+    subtree = _root_subtree(root, depth, max_depth, one_file_system, index)
+    yield from _walk_subtrees([subtree], prune, jobs)
+
+
+def walk_roots(roots: Iterable[str], prune: Optional[Callable[[str], bool]] = None, max_depth: Optional[int] = None,
+               one_file_system: bool = False, jobs: int = 1,
+               index: Optional[DirIndex] = None) -> Iterator[PathEntry]:
+    """ yields each root followed by all files and dirs below it. The subtrees of
+    all roots are scanned by a pool of threads if jobs > 1.
+
+    :argument
+      roots: files/dirs, the roots themselves are yielded too and are never pruned
+      prune, max_depth, one_file_system, jobs, index: see walk(), max_depth is relative to each root
+
+    :returns
+      generator of PathEntry objects, parents are yielded before their children.
+    """
+    subtrees = []
+    for root in roots:
+        entry = PathEntry.from_path(root)
+        yield entry
+        if entry.is_dir and not entry.is_symlink:
+            subtrees.append(_root_subtree(entry.path, entry.depth, max_depth, one_file_system, index))
+    yield from _walk_subtrees(subtrees, prune, jobs)
+
+
+def _root_subtree(root: str, depth: int, max_depth: Optional[int], one_file_system: bool,
+                  index: Optional[DirIndex] = None) -> _Subtree:
+    if root in ('', '.'):
+        root, prefix = '.', ''
+    else:
+        prefix = root if root.endswith('/') else root + '/'
+    if one_file_system:
+        syscalls.add('stat')
+    return _Subtree(
+        dir_path=root,
+        prefix=prefix,
+        depth=depth,
+        max_depth=depth + max_depth if max_depth is not None else None,
+        dev=os.stat(root).st_dev if one_file_system else None,
+        index=index,
+    )
+
+
+def _walk_subtrees(subtrees: List[_Subtree], prune: Optional[Callable[[str], bool]],
+                   jobs: int) -> Iterator[PathEntry]:
+    if jobs <= 1:
+        yield from _walk_serial(subtrees, prune)
+        return
+    # big subtrees are split up level by level until every worker gets a subtree:
+    for _ in range(_MAX_SPLIT_LEVELS):
+        if not subtrees or len(subtrees) >= jobs:
+            break
+        children = []
+        for subtree in subtrees:
+            for entry, child in _scan(subtree, prune):
+                yield entry
+                if child is not None:
+                    children.append(child)
+        subtrees = children
+    if not subtrees:
+        return
+    yield from _walk_parallel(subtrees, prune, jobs)
+
+
+def _walk_parallel(subtrees: List[_Subtree], prune: Optional[Callable[[str], bool]],
+                   jobs: int) -> Iterator[PathEntry]:
+    """ walks jobs subtrees at a time, each worker passes its entries in chunks through
+    a bounded queue. The subtrees are yielded in their order, so the output doesn't
+    depend on thread timing. Workers ahead of the yielded subtree block when their
+    queue is full, at most jobs * (_QUEUED_CHUNKS + 1) chunks are held in memory.
+    The workers are daemon threads, so a walk which is never consumed to the end
+    doesn't keep the interpreter from exiting. """
+    # only loaded for parallel walks
+    import queue
+    import threading
+    from collections import deque
+
+    stopped = threading.Event()
+
+    def put(chunks: queue.Queue, item) -> bool:
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(subtree: _Subtree, chunks: queue.Queue) -> None:
+        try:
+            chunk = []
+            for entry in _walk_serial([subtree], prune):
+                chunk.append(entry)
+                if len(chunk) >= _CHUNK_ENTRIES:
+                    if not put(chunks, chunk):
+                        return
+                    chunk = []
+            if put(chunks, chunk):
+                put(chunks, None)
+        except BaseException as e:
+            put(chunks, e)
+
+    pending_subtrees = iter(subtrees)
+    in_flight: deque = deque()
+
+    def start_next() -> None:
+        for subtree in pending_subtrees:
+            chunks: queue.Queue = queue.Queue(maxsize=_QUEUED_CHUNKS)
+            threading.Thread(target=produce, args=(subtree, chunks), daemon=True).start()
+            in_flight.append(chunks)
+            return
+
+    for _ in range(jobs):
+        start_next()
+    try:
+        while in_flight:
+            chunks = in_flight[0]
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield from chunk
+            in_flight.popleft()
+            start_next()
+    finally:
+        # workers blocked on a full queue give up if the walk isn't consumed to the end
+        stopped.set()
+
+
+def _walk_serial(subtrees: List[_Subtree], prune: Optional[Callable[[str], bool]]) -> Iterator[PathEntry]:
+    # only pending dirs are kept on the stack, at most one directory is open at a time
+    stack = subtrees[::-1]
+    while stack:
+        for entry, child in _scan(stack.pop(), prune):
+            yield entry
+            if child is not None:
+                stack.append(child)
+
+
+def _scan(subtree: _Subtree, prune: Optional[Callable[[str], bool]]) -> Iterator[Tuple[PathEntry, Optional[_Subtree]]]:
+    """ yields the entries of one directory, each with the subtree to descend into (or None). """
+    if subtree.max_depth is not None and subtree.depth >= subtree.max_depth:
+        return
+    if subtree.index is not None:
+        yield from _scan_indexed(subtree, prune)
+        return
+    syscalls.add('scandir')
+    try:
+        scanner = os.scandir(subtree.dir_path)
+    except OSError:
+        return
+    depth = subtree.depth + 1
+    with scanner:
+        for dir_entry in scanner:
+            path = subtree.prefix + dir_entry.name
+            try:
+                is_symlink = dir_entry.is_symlink()
+                is_dir = dir_entry.is_dir()
+                is_file = dir_entry.is_file()
+            except OSError:
+                is_symlink = is_dir = is_file = False
+            child = None
+            if is_dir and not is_symlink:
+                if prune is not None and prune(dir_entry.name):
+                    continue
+                if subtree.dev is None or _on_device(dir_entry, subtree.dev):
+                    child = subtree._replace(dir_path=path, prefix=path + '/', depth=depth)
+            yield PathEntry(path, dir_entry.name, depth, is_dir, is_file, is_symlink), child
+
+
+def _scan_indexed(subtree: _Subtree,
+                  prune: Optional[Callable[[str], bool]]) -> Iterator[Tuple[PathEntry, Optional[_Subtree]]]:
+    # the device is checked by the index when the child dir is listed, a mount point
+    # is yielded by its parent but not listed
+    listing = subtree.index.listdir(subtree.dir_path, subtree.dev)
+    if listing is None:
+        return
+    depth = subtree.depth + 1
+    for name, kind in listing:
+        path = subtree.prefix + name
+        is_dir, is_symlink = bool(kind & DIR), bool(kind & SYMLINK)
+        child = None
+        if is_dir and not is_symlink:
+            if prune is not None and prune(name):
+                continue
+            child = subtree._replace(dir_path=path, prefix=path + '/', depth=depth)
+        yield PathEntry(path, name, depth, is_dir, bool(kind & FILE), is_symlink), child
+
+
+def _on_device(dir_entry: os.DirEntry, dev: int) -> bool:
+    syscalls.add('stat')
+    try:
+        return dir_entry.stat(follow_symlinks=False).st_dev == dev
+    except OSError:
+        return False
@@ -0,0 +1,203 @@
+"""directory watcher
+=================
+inotify based watching of directories for new and moved-in files/dirs, through
+a thin ctypes layer over the libc functions
+"""
+# Copyright (c) 2020, Niklas Tiede.
+# All rights reserved. Distributed under the MIT License.
+
+import ctypes
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .walker import PathEntry, walk
+
+# event bits of inotify(7)
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_MOVED_TO | IN_ONLYDIR
+
+_EVENT = struct.Struct('iIII')
+# size of the buffer events are read into
+READ_SIZE = 1 << 16
+# seconds events are collected after the first one of a batch
+WINDOW = 0.05
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc = libc
+    return _libc
+
+
+def _check(result: int, path: Optional[str] = None) -> int:
+    if result < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), path)
+    return result
+
+
+class Watcher:
+    """ watches directories (with recursive=True their subdirs as well) and yields
+    the files/dirs created or moved into them in batches. Between the batches the
+    process sleeps in poll(2), so watching costs no CPU time while nothing happens.
+    """
+
+    def __init__(self, roots: Iterable[str], recursive: bool = False,
+                 prune: Optional[Callable[[str], bool]] = None, window: float = WINDOW):
+        if not sys.platform.startswith('linux'):
+            raise OSError('watching directories requires inotify (Linux)')
+        self.roots = [os.path.normpath(root) for root in roots]
+        self.recursive = recursive
+        self.prune = prune
+        self.window = window
+        self._fd = _check(_load_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self._paths: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+        # (wd, name) of the entries renamed by spasco itself, their events are skipped
+        self._own: Set[Tuple[int, str]] = set()
+        for root in self.roots:
+            self._add_watch(root)
+            if recursive:
+                self._watch_subdirs(root)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def batches(self) -> Iterator[List[PathEntry]]:
+        """ yields the new files/dirs in batches, blocks until the next batch arrived.
+        The entries of moved-in and new directories are included if recursive. """
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        while True:
+            poller.poll()
+            deadline = time.monotonic() + self.window
+            events = self._read_events()
+            remaining = deadline - time.monotonic()
+            while remaining > 0 and poller.poll(remaining * 1000):
+                events.extend(self._read_events())
+                remaining = deadline - time.monotonic()
+            entries = list(self._new_entries(events))
+            if entries:
+                yield entries
+
+    def renamed(self, src: str, dst: str, is_dir: bool) -> None:
+        """ to be called for each renaming done by the caller: the event caused by the
+        renaming is skipped and the watches of renamed dirs keep their paths up to date. """
+        parent, _, name = dst.rpartition('/')
+        wd = self._wds.get(parent or '.')
+        if wd is not None:
+            self._own.add((wd, name))
+        if is_dir:
+            prefix = src + '/'
+            for wd, path in list(self._paths.items()):
+                if path == src or path.startswith(prefix):
+                    new_path = dst + path[len(src):]
+                    self._paths[wd] = new_path
+                    del self._wds[path]
+                    self._wds[new_path] = wd
+
+    def _add_watch(self, path: str) -> None:
+        wd = _check(_load_libc().inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK), path)
+        old_path = self._paths.get(wd)
+        if old_path is not None:  # the same dir under a new name
+            self._wds.pop(old_path, None)
+        self._paths[wd] = path
+        self._wds[path] = wd
+
+    def _watch_subdirs(self, root: str) -> List[PathEntry]:
+        """ watches all subdirs of root, returns their entries. """
+        entries = []
+        depth = 0 if root == '.' else PathEntry.from_path(root).depth
+        for entry in walk(root, depth=depth, prune=self.prune):
+            entries.append(entry)
+            if entry.is_dir and not entry.is_symlink:
+                try:
+                    self._add_watch(entry.path)
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def _read_events(self) -> List[Tuple[int, int, str]]:
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def _new_entries(self, events: List[Tuple[int, int, str]]) -> Iterator[PathEntry]:
+        seen = set()
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, everything below the roots is checked instead
+                sys.stderr.write('spasco: too many events, the watched directories are scanned again\n')
+                yield from self._rescan()
+                return
+            if mask & IN_IGNORED:  # the watched dir was removed
+                path = self._paths.pop(wd, None)
+                if path is not None and self._wds.get(path) == wd:
+                    del self._wds[path]
+                continue
+            if (wd, name) in self._own:
+                self._own.discard((wd, name))
+                continue
+            parent = self._paths.get(wd)
+            if parent is None:
+                continue
+            path = name if parent == '.' else f'{parent}/{name}'
+            if path in seen or not os.path.lexists(path):
+                continue
+            seen.add(path)
+            entry = PathEntry.from_path(path)
+            if self.recursive and entry.is_dir and not entry.is_symlink:
+                if self.prune is not None and self.prune(entry.name):
+                    continue
+                # the dir may have got content before it was watched
+                try:
+                    self._add_watch(path)
+                except FileNotFoundError:
+                    continue
+                yield entry
+                yield from self._watch_subdirs(path)
+                continue
+            yield entry
+
+    def _rescan(self) -> Iterator[PathEntry]:
+        self._own.clear()
+        for root in self.roots:
+            if self.recursive:
+                yield from self._watch_subdirs(root)
+            else:
+                for name in os.listdir(root):
+                    yield PathEntry.from_path(name if root == '.' else f'{root}/{name}')
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from src import spasco
+from src.spasco.api import ConflictError, Filters
+
+
+def test_plan_and_apply(tmp_path, monkeypatch):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    (tmp_path / 'a b' / 'e&f').touch()
+    (tmp_path / 'g h').touch()
+    monkeypatch.chdir(tmp_path)
+    rename_plan = spasco.plan(['a b'], rules=[(' ', '_'), ('&', 'and')])
+    assert sorted(op.dst for op in rename_plan) == ['a b/c_d', 'a b/eandf', 'a_b']
+    results = list(spasco.apply(rename_plan))
+    assert [result.error for result in results] == [None] * 3
+    assert sorted(p.name for p in (tmp_path / 'a_b').iterdir()) == ['c_d', 'eandf']
+    assert (tmp_path / 'g h').exists()
+
+
+def test_filters_and_non_recursive_plan(tmp_path, monkeypatch):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    (tmp_path / 'e f').touch()
+    monkeypatch.chdir(tmp_path)
+    assert [op.dst for op in spasco.plan(filters=Filters(files_only=True))] == ['e_f']
+    assert sorted(op.dst for op in spasco.plan(recursive=False)) == ['a_b', 'e_f']
+
+
+def test_conflicts_are_raised_before_renaming(tmp_path, monkeypatch):
+    (tmp_path / 'a b').touch()
+    (tmp_path / 'a_b').touch()
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ConflictError) as excinfo:
+        list(spasco.apply(spasco.plan()))
+    assert excinfo.value.conflicts[0].target == 'a_b'
+    assert (tmp_path / 'a b').exists()
+
+
+def test_async_wrapper(tmp_path, monkeypatch):
+    for name in ('a b', 'c d'):
+        (tmp_path / name).touch()
+    monkeypatch.chdir(tmp_path)
+
+    async def rename():
+        rename_plan = await spasco.aplan(rules=spasco.RegexRule(r'\s', '-'))
+        return [result.op.dst async for result in spasco.aapply(rename_plan)]
+
+    assert sorted(asyncio.run(rename())) == ['a-b', 'c-d']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a-b', 'c-d']
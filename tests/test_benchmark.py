@@ -0,0 +1,25 @@
+import json
+import os
+
+from benchmarks.bench_pipeline import PHASES, benchmark, main, make_tree
+
+
+def test_make_tree(tmp_path):
+    count = make_tree(str(tmp_path), depth=2, fanout=3, files=4, match_share=1.0, name_length=10)
+    names = [name for _, dirs, files in os.walk(tmp_path) for name in dirs + files]
+    assert count == len(names) == (1 + 3 + 9) * 4 + 3 + 9
+    assert all(' ' in name and len(name) == 10 for name in names)
+
+
+def test_benchmark_times_every_phase(tmp_path):
+    result = benchmark(depth=1, fanout=2, files=3, match_share=0.5, repeat=2, base_dir=str(tmp_path))
+    assert set(result['phases']) == set(PHASES)
+    assert all(len(timing['runs']) == 2 for timing in result['phases'].values())
+    assert result['entries'] == 11
+    assert os.listdir(tmp_path) == []
+
+
+def test_results_are_written_as_json(tmp_path):
+    output = tmp_path / 'result.json'
+    assert main(['--depth', '1', '--repeat', '1', '--dir', str(tmp_path), '-o', str(output)]) == 0
+    assert json.loads(output.read_text())['params']['depth'] == 1
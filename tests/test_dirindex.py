@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from src.spasco import dirindex
+from src.spasco.dirindex import DirIndex
+from src.spasco.walker import walk
+
+OLD = 1_000_000_000
+
+
+def make_tree(base):
+    (base / 'w' / 'a b' / 'c d').mkdir(parents=True)
+    (base / 'w' / 'a b' / 'c d' / 'e f').touch()
+    (base / 'w' / 'x y').touch()
+    age_dirs(base / 'w')
+
+
+def age_dirs(root, mtime=OLD):
+    for dir_path, _, _ in os.walk(root):
+        os.utime(dir_path, (mtime, mtime))
+
+
+def count_scandir(monkeypatch):
+    calls = []
+    scandir = os.scandir
+
+    def counting_scandir(path='.'):
+        calls.append(path)
+        return scandir(path)
+    monkeypatch.setattr(dirindex.os, 'scandir', counting_scandir)
+    return calls
+
+
+def entries(walker):
+    return sorted((e.path, e.depth, e.is_dir, e.is_file, e.is_symlink) for e in walker)
+
+
+def test_unchanged_dirs_are_not_read_again(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path / 'w')
+    index = DirIndex()
+    first = entries(walk(index=index))
+    assert first == entries(walk())
+    index.save(str(tmp_path / 'index'))
+
+    calls = count_scandir(monkeypatch)
+    index = DirIndex.load(str(tmp_path / 'index'))
+    assert entries(walk(index=index)) == first
+    assert calls == []
+    assert index.hits == 3
+
+
+def test_changed_dirs_are_read_again(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path / 'w')
+    index = DirIndex()
+    list(walk(index=index))
+    index.save(str(tmp_path / 'index'))
+    (tmp_path / 'w' / 'a b' / 'g h').touch()
+    age_dirs(tmp_path / 'w' / 'a b', OLD + 10)
+
+    calls = count_scandir(monkeypatch)
+    index = DirIndex.load(str(tmp_path / 'index'))
+    assert 'a b/g h' in {entry.path for entry in walk(index=index)}
+    assert sorted(calls) == ['a b', 'a b/c d']
+
+
+def test_recently_modified_dirs_are_not_cached(tmp_path, monkeypatch):
+    (tmp_path / 'w' / 'new').mkdir(parents=True)
+    make_tree(tmp_path)
+    os.utime(tmp_path / 'w' / 'new')
+    monkeypatch.chdir(tmp_path / 'w')
+    index = DirIndex()
+    list(walk(index=index))
+    assert len(index) == 3
+    assert index.listdir('new') == []
+    assert len(index) == 3
+
+
+def test_removed_dirs_are_dropped_on_save(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    (tmp_path / 'other').mkdir()
+    age_dirs(tmp_path / 'other')
+    monkeypatch.chdir(tmp_path)
+    index = DirIndex()
+    list(walk('w', index=index))
+    list(walk('other', index=index))
+    index.save(str(tmp_path / 'index'))
+    os.remove(tmp_path / 'w' / 'a b' / 'c d' / 'e f')
+    os.rmdir(tmp_path / 'w' / 'a b' / 'c d')
+    age_dirs(tmp_path / 'w', OLD + 10)
+
+    index = DirIndex.load(str(tmp_path / 'index'))
+    list(walk('w', index=index))
+    index.save(str(tmp_path / 'index'))
+    assert len(DirIndex.load(str(tmp_path / 'index'))) == 3
+
+
+def test_unreadable_index_file_gives_empty_index(tmp_path):
+    (tmp_path / 'index').write_bytes(b'no index')
+    assert len(DirIndex.load(str(tmp_path / 'index'))) == 0
+    assert len(DirIndex.load(str(tmp_path / 'missing'))) == 0
+
+
+def test_failed_save_leaves_no_tmp_file(tmp_path):
+    (tmp_path / 'index').mkdir()
+    with pytest.raises(OSError):
+        DirIndex().save(str(tmp_path / 'index'))
+    assert os.listdir(tmp_path) == ['index']
@@ -0,0 +1,43 @@
+import pytest
+
+from src.spasco import executor
+from src.spasco.executor import execute_plan, rename_noreplace
+from src.spasco.planner import plan_renames
+from src.spasco.walker import walk
+
+
+def make_tree(base, width=4):
+    for i in range(width):
+        for j in range(width):
+            (base / f'd {i}' / f's {j}').mkdir(parents=True)
+            (base / f'd {i}' / f's {j}' / 'f x').touch()
+
+
+def underscores(name):
+    return name.replace(' ', '_')
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_plan_is_executed_deepest_first(tmp_path, monkeypatch, jobs):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    plan = plan_renames(walk(), underscores)
+    results = list(execute_plan(plan, jobs=jobs))
+    assert len(results) == len(plan) == 36
+    assert all(result.error is None for result in results)
+    assert sorted(entry.path for entry in walk()) == sorted(plan.final_path(op.src) for op in plan)
+
+
+@pytest.mark.parametrize('renameat2', [None, False])
+def test_existing_targets_are_not_replaced(tmp_path, monkeypatch, renameat2):
+    monkeypatch.setattr(executor, '_renameat2', renameat2)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'a b').write_text('a b')
+    (tmp_path / 'a_b').write_text('a_b')
+    with pytest.raises(FileExistsError):
+        rename_noreplace('a b', 'a_b')
+    assert (tmp_path / 'a_b').read_text() == 'a_b'
+    plan = plan_renames(walk(), underscores)
+    [result] = execute_plan(plan)
+    assert isinstance(result.error, FileExistsError)
+    assert (tmp_path / 'a b').exists()
@@ -0,0 +1,63 @@
+from src.spasco.filters import build_filter_pipeline
+from src.spasco.rules import RegexRule, RuleSet
+from src.spasco.walker import PathEntry
+
+
+ENTRIES = [
+    PathEntry('a b', 'a b', 1, is_dir=True),
+    PathEntry('a b/c d.txt', 'c d.txt', 2, is_file=True),
+    PathEntry('a b/e f.tmp', 'e f.tmp', 2, is_file=True),
+    PathEntry('a b/gh', 'gh', 2, is_file=True),
+]
+
+
+def run(entries=ENTRIES, **kwargs):
+    pipeline = build_filter_pipeline(**kwargs)
+    return pipeline, [entry.path for entry in pipeline.run(entries)]
+
+
+def test_search_value_is_matched_against_the_name():
+    _, paths = run(search_value=' ')
+    assert paths == ['a b', 'a b/c d.txt', 'a b/e f.tmp']
+
+
+def test_all_stages_in_one_pass():
+    _, paths = run(search_value=' ', except_pattern=['*.tmp'], files_only=True)
+    assert paths == ['a b/c d.txt']
+    _, paths = run(search_value=' ', pattern_only=['*.tmp'])
+    assert paths == ['a b/e f.tmp']
+    _, paths = run(search_value=' ', dirs_only=True)
+    assert paths == ['a b']
+
+
+def test_reports_the_stage_which_removed_everything():
+    pipeline, paths = run(search_value='#')
+    assert not paths
+    assert pipeline.failed_stage().name == 'search-value'
+    assert pipeline.failure_message() == "None of the selected 4 files/dirs contained the search-value '#' "
+    pipeline, paths = run(search_value=' ', pattern_only=['*.txt'], dirs_only=True)
+    assert pipeline.failed_stage().name == 'dirs-only'
+    assert pipeline.failure_message() == 'No directory present after filtering out files.'
+
+
+def test_pipeline_does_not_stat(monkeypatch):
+    monkeypatch.setattr('os.stat', None)
+    monkeypatch.setattr('os.lstat', None)
+    _, paths = run(search_value=' ', files_only=True)
+    assert paths == ['a b/c d.txt', 'a b/e f.tmp']
+
+
+def test_rules_replace_the_search_value():
+    rules = RuleSet([(' ', '_'), ('.tmp', '.bak')])
+    _, paths = run(search_value=' ', rules=rules, pattern_only=['gh*', '*.tmp'])
+    assert paths == ['a b/e f.tmp']
+    pipeline, paths = run(entries=ENTRIES[3:], search_value=' ', rules=rules)
+    assert pipeline.failure_message() == ("None of the selected 1 files/dirs contained a search-value of the rules "
+                                          "' ' by '_', '.tmp' by '.bak' ")
+
+
+def test_regex_rule_as_prefilter():
+    pipeline, paths = run(search_value=r'\.tmp$', rules=RegexRule(r'\.tmp$', '.bak'))
+    assert paths == ['a b/e f.tmp']
+    pipeline, paths = run(search_value='^x', rules=RegexRule('^x', ''))
+    assert pipeline.failure_message() == "None of the selected 4 files/dirs contained a match of the pattern '^x' "
@@ -0,0 +1,80 @@
+import os
+
+from src.spasco.journal import Journal, run_journal, undo_journal
+from src.spasco.planner import plan_renames
+from src.spasco.walker import walk
+
+
+def make_tree(base):
+    for i in range(3):
+        (base / f'd {i}' / 's x').mkdir(parents=True)
+        (base / f'd {i}' / 's x' / 'f x').touch()
+
+
+def plan_tree():
+    return plan_renames(walk(), lambda name: name.replace(' ', '_'))
+
+
+def final_tree():
+    return sorted(entry.path for entry in walk())
+
+
+def test_interrupted_run_is_resumed_from_the_journal(tmp_path, monkeypatch):
+    make_tree(tmp_path / 'tree')
+    monkeypatch.chdir(tmp_path / 'tree')
+    plan = plan_tree()
+    journal = Journal.create(str(tmp_path / 'journal'), plan, batch_size=2)
+    results = run_journal(journal)
+    for _ in range(3):  # the 1st batch is committed, the 2nd one only half done
+        assert next(results).error is None
+    results.close()
+    journal.close()
+
+    journal = Journal.load(str(tmp_path / 'journal'))
+    assert journal.done == {0}
+    assert len(journal.pending()) == len(journal.batches) - 1
+    with journal:
+        assert all(result.error is None for result in run_journal(journal))
+    assert final_tree() == ['d_0', 'd_0/s_x', 'd_0/s_x/f_x', 'd_1', 'd_1/s_x', 'd_1/s_x/f_x',
+                            'd_2', 'd_2/s_x', 'd_2/s_x/f_x']
+    assert not Journal.load(str(tmp_path / 'journal')).pending()
+
+
+def test_resume_after_losing_unsynced_commit_records(tmp_path, monkeypatch):
+    make_tree(tmp_path / 'tree')
+    monkeypatch.chdir(tmp_path / 'tree')
+    path = str(tmp_path / 'journal')
+    synced_sizes = []
+    sync = Journal._sync
+
+    def recording_sync(journal):
+        sync(journal)
+        synced_sizes.append(os.path.getsize(path))
+
+    monkeypatch.setattr(Journal, '_sync', recording_sync)
+    journal = Journal.create(path, plan_tree(), batch_size=2)
+    assert all(result.error is None for result in run_journal(journal))
+    journal.close()
+    # a crash loses everything written after the last sync before close()
+    os.truncate(path, synced_sizes[-2])
+
+    journal = Journal.load(path)
+    assert journal.pending()
+    with journal:
+        assert all(result.error is None for result in run_journal(journal))
+    assert final_tree() == ['d_0', 'd_0/s_x', 'd_0/s_x/f_x', 'd_1', 'd_1/s_x', 'd_1/s_x/f_x',
+                            'd_2', 'd_2/s_x', 'd_2/s_x/f_x']
+
+
+def test_undo_renames_everything_back(tmp_path, monkeypatch):
+    make_tree(tmp_path / 'tree')
+    monkeypatch.chdir(tmp_path / 'tree')
+    before = final_tree()
+    with Journal.create(str(tmp_path / 'journal'), plan_tree()) as journal:
+        list(run_journal(journal))
+    assert final_tree() != before
+    os.chdir(tmp_path)
+    results = list(undo_journal(Journal.load(str(tmp_path / 'journal'))))
+    assert len(results) == 9 and all(result.error is None for result in results)
+    os.chdir(tmp_path / 'tree')
+    assert final_tree() == before
@@ -1,5 +1,17 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import time
 
+import pytest
+
+from src.spasco import main as spasco_main
 from src.spasco.main import main
+from src.spasco.planfile import read_plan
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 # def test_version(capsys):
@@ -8,3 +20,180 @@ from src.spasco.main import main
 #     result = captured.out
 #     assert result == 'spasco 0.1.0'
 
+
+def test_recursive_with_several_roots(tmp_path, monkeypatch):
+    for root in ('r 1', 'r 2', 'r 3'):
+        (tmp_path / root / 'a b').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '-j', '2', 'r 1', 'r 2']) == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['r 3', 'r_1', 'r_2']
+    assert (tmp_path / 'r_1' / 'a_b').is_dir()
+    assert (tmp_path / 'r 3' / 'a b').is_dir()
+
+
+def test_plan_out_and_apply(tmp_path, monkeypatch):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    assert main(['spasco', '-r', '--plan-out', str(tmp_path / 'plan')]) == 0
+    assert (tmp_path / 'a b' / 'c d').is_dir()
+    monkeypatch.chdir('/')
+    assert main(['spasco', 'apply', str(tmp_path / 'plan')]) == 0
+    assert (tmp_path / 'a_b' / 'c_d').is_dir()
+    assert main(['spasco', 'apply', str(tmp_path / 'plan')]) == 1
+
+
+def test_version_needs_no_config_and_no_listing(tmp_path, monkeypatch):
+    def listdir(*args):
+        raise AssertionError('the cwd was listed')
+    monkeypatch.setattr(os, 'listdir', listdir)
+    monkeypatch.setattr(spasco_main, 'settings_file', str(tmp_path / 'settings.ini'))
+    monkeypatch.setattr(spasco_main, '_config', None)
+    with pytest.raises(SystemExit) as exc_info:
+        main(['spasco', '--version'])
+    assert exc_info.value.code == 0
+    assert spasco_main._config is None
+    assert not (tmp_path / 'settings.ini').exists()
+
+
+def test_startup_loads_no_renaming_modules():
+    code = ('import sys, time; start = time.perf_counter(); import src.spasco.main; '
+            'print(time.perf_counter() - start); '
+            "print(' '.join(m for m in ('ctypes', 'json', 'logging', 'subprocess', 'concurrent.futures') "
+            'if m in sys.modules))')
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, stdout=subprocess.PIPE,
+                         universal_newlines=True, check=True).stdout.split('\n')
+    assert time.perf_counter() - start < 5
+    assert float(out[0]) < 0.5
+    assert out[1] == ''
+
+
+def test_default_values_without_settings_file(tmp_path, monkeypatch):
+    (tmp_path / 'w').mkdir()
+    (tmp_path / 'w' / 'a b').touch()
+    monkeypatch.chdir(tmp_path / 'w')
+    monkeypatch.setattr(spasco_main, 'settings_file', str(tmp_path / 'settings.ini'))
+    monkeypatch.setattr(spasco_main, '_config', None)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco']) == 0
+    assert os.listdir(tmp_path / 'w') == ['a_b']
+    assert not (tmp_path / 'settings.ini').exists()
+
+
+def test_regex_mode(tmp_path, monkeypatch):
+    (tmp_path / 'IMG 001.jpg').touch()
+    (tmp_path / 'IMG 002.JPG').touch()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '--regex', '-s', r'IMG (\d+)\.(?i:jpg)', '-n', r'photo_\1.jpg']) == 0
+    assert sorted(os.listdir(tmp_path)) == ['photo_001.jpg', 'photo_002.jpg']
+
+
+def test_paths_from_nul_delimited_file(tmp_path, monkeypatch):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    (tmp_path / 'e f').touch()
+    (tmp_path / 'g h').touch()
+    (tmp_path / 'list').write_bytes(b'a b\0./e f\0\0')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '--from-file', 'list']) == 0
+    assert sorted(os.listdir(tmp_path)) == ['a_b', 'e_f', 'g h', 'list']
+    assert (tmp_path / 'a_b' / 'c_d').is_dir()
+
+
+def test_paths_from_stdin(tmp_path, monkeypatch):
+    (tmp_path / 'a b').touch()
+    (tmp_path / 'c d').touch()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(os.fsencode(f'{tmp_path}/a b\0'))))
+    assert main(['spasco', '--from-stdin0', '--plan-out', 'plan']) == 0
+    with open('plan', 'rb') as fp:
+        _, plan = read_plan(fp)
+    assert [(op.src, op.dst) for op in plan] == [(f'{tmp_path}/a b', f'{tmp_path}/a_b')]
+
+
+def test_stats_as_json(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    (tmp_path / 'a b' / 'e f').touch()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '--stats', 'json']) == 0
+    captured = capsys.readouterr()
+    assert '1 files and 2 directories were renamed.' in captured.out
+    stages = {stage['name']: stage for stage in json.loads(captured.err)['stages']}
+    assert list(stages) == ['walk', 'filter', 'filter: search-value', 'plan', 'conflicts', 'preview', 'rename']
+    assert stages['walk']['items'] == 3
+    assert stages['rename']['items_in'] == stages['rename']['items'] == 3
+    # 3 dirs listed, 3 targets looked up, 2 parent dirs opened for 3 renamings
+    assert (stages['walk']['syscalls'], stages['conflicts']['syscalls'], stages['rename']['syscalls']) == (3, 3, 5)
+
+
+@pytest.mark.parametrize('args, walk_syscalls', [
+    ([], 1),  # a single scandir of the cwd
+    (['-f', 'a b', 'c d'] + [f'x{i}' for i in range(200)], 2),  # an lstat per path reaching -f
+])
+def test_file_types_are_only_looked_up_when_needed(tmp_path, monkeypatch, capsys, args, walk_syscalls):
+    for i in range(200):
+        (tmp_path / f'x{i}').touch()
+    (tmp_path / 'a b').touch()
+    (tmp_path / 'c d').mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'n')
+    main(['spasco', '--stats', 'json'] + args)
+    stages = {stage['name']: stage for stage in json.loads(capsys.readouterr().err)['stages']}
+    assert stages['walk']['syscalls'] == walk_syscalls
+
+
+def test_update_references(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'src dir' / 'sub dir').mkdir(parents=True)
+    (tmp_path / 'src dir' / 'build.mk').write_text('OBJ = src dir/sub dir/main.o\n')
+    (tmp_path / 'Makefile').write_text('include src dir/build.mk\n')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '--update-references', '**/Makefile', '--update-references', '**/*.mk']) == 0
+    assert '2 references were updated in 2 files.' in capsys.readouterr().out
+    assert (tmp_path / 'Makefile').read_text() == 'include src_dir/build.mk\n'
+    assert (tmp_path / 'src_dir' / 'build.mk').read_text() == 'OBJ = src_dir/sub_dir/main.o\n'
+
+
+def test_retarget_symlinks(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'data set' / 'part 1').mkdir(parents=True)
+    (tmp_path / 'links').mkdir()
+    (tmp_path / 'links' / 'part').symlink_to(os.path.join('..', 'data set', 'part 1'))
+    (tmp_path / 'data set' / 'latest').symlink_to('part 1')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '--retarget-symlinks']) == 0
+    assert '2 symlinks were retargeted.' in capsys.readouterr().out
+    assert os.readlink(tmp_path / 'links' / 'part') == os.path.join('..', 'data_set', 'part_1')
+    assert os.readlink(tmp_path / 'data_set' / 'latest') == 'part_1'
+
+
+def test_new_name_with_slash_is_rejected(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'a b').touch()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '--regex', '-s', '(a) (b)', '-n', r'\1/\2', 'a b']) == 1
+    assert "'a b' cannot be renamed to 'a/b'" in capsys.readouterr().out
+    assert os.listdir(tmp_path) == ['a b']
+
+
+def test_unwritable_index_is_reported(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'a b').mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(spasco_main, 'index_file', str(tmp_path / 'missing' / 'dirindex.bin'))
+    monkeypatch.setattr('builtins.input', lambda prompt: 'y')
+    assert main(['spasco', '-r', '--index']) == 0
+    assert 'the directory index cannot be saved' in capsys.readouterr().err
+    assert (tmp_path / 'a_b').is_dir()
+
+
+def test_path_renaming(tmp_path, monkeypatch):
+    (tmp_path / 'a b' / 'c d').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    paths = ['a b', os.path.join('a b', 'c d')]
+    assert spasco_main.path_renaming(paths, ' ', '_') == ['a_b', os.path.join('a b', 'c_d')]
+    assert (tmp_path / 'a b' / 'c d').is_dir()
+    spasco_main.path_renaming(paths, ' ', '_', renaming=True)
+    assert (tmp_path / 'a_b' / 'c_d').is_dir()
@@ -0,0 +1,29 @@
+import fnmatch
+
+import pytest
+
+from src.spasco.matcher import GlobMatcher
+
+NAMES = ['a b.tmp', 'a.bak', 'build', 'build dir', 'rebuild', 'x[1].txt', 'data_7.csv', '.hidden', 'README']
+
+
+@pytest.mark.parametrize('patterns', [
+    ['*.tmp'],
+    ['build*'],
+    ['README'],
+    ['*.tmp', '*.bak', 'build*'],
+    ['data_?.csv', '*[[]1]*'],
+    ['*', 'x*t'],
+    ['.*', '*.tmp', 'data_[0-9].*', 'README', 're*'],
+])
+def test_matches_like_fnmatch(patterns):
+    matcher = GlobMatcher(patterns)
+    for name in NAMES:
+        expected = any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+        assert matcher(name) is expected, (name, patterns)
+
+
+def test_empty_matcher():
+    matcher = GlobMatcher([])
+    assert not matcher
+    assert not matcher('anything')
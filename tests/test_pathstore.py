@@ -0,0 +1,22 @@
+from src.spasco.pathstore import NO_PARENT, PathStore
+
+
+def test_paths_are_stored_as_nodes_and_rebuilt_losslessly():
+    store = PathStore()
+    paths = ['a b/c/d e', 'a b/c/f', 'a b', '/abs/x y', 'g', '//net/h', '../up']
+    nodes = [store.add(path) for path in paths]
+    assert [store.path(node) for node in nodes] == paths
+    assert store.add('a b/c/f') == nodes[1]
+    assert store.find('a b/c') == store.parent(nodes[0])
+    assert store.find('a b/x') is None
+    assert store.parent(nodes[2]) == NO_PARENT
+    assert store.name(nodes[3]) == 'x y'
+
+
+def test_shared_parents_and_names_are_stored_once():
+    store = PathStore()
+    for i in range(100):
+        store.add(f'dir/sub {i}/same name')
+    assert len(store) == 1 + 100 + 100
+    names = {id(store.name(store.find(f'dir/sub {i}/same name'))) for i in range(100)}
+    assert len(names) == 1
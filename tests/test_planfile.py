@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+from src.spasco.planfile import PlanFileError, iter_nul_delimited, read_plan, write_plan
+from src.spasco.planner import plan_renames
+from src.spasco.walker import PathEntry
+
+
+def make_plan():
+    entries = [PathEntry('a b', 'a b', 1, is_dir=True), PathEntry('a b/c d', 'c d', 2),
+               PathEntry('/abs/e f', 'e f', 2), PathEntry('näme \udcff', 'näme \udcff', 1)]
+    return plan_renames(entries, lambda name: name.replace(' ', '_'))
+
+
+def test_plan_round_trip():
+    fp = io.BytesIO()
+    assert write_plan(make_plan(), fp, base_dir='/base') == 4
+    fp.seek(0)
+    base_dir, plan = read_plan(fp)
+    assert base_dir == '/base'
+    assert [(op.src, op.dst, op.depth, op.is_dir) for op in plan] == [
+        ('/base/a b/c d', '/base/a b/c_d', 2, False),
+        ('/abs/e f', '/abs/e_f', 2, False),
+        ('/base/a b', '/base/a_b', 1, True),
+        ('/base/näme \udcff', '/base/näme_\udcff', 1, False),
+    ]
+
+
+def test_invalid_plan_files_are_rejected():
+    with pytest.raises(PlanFileError):
+        read_plan(io.BytesIO(b'something else\n'))
+    fp = io.BytesIO()
+    write_plan(make_plan(), fp, base_dir='/base')
+    with pytest.raises(PlanFileError, match='truncated'):
+        read_plan(io.BytesIO(fp.getvalue()[:-20]))
+    with pytest.raises(PlanFileError, match='invalid new name'):
+        read_plan(io.BytesIO(fp.getvalue().replace(b'c_d', b'c/d')))
+    with pytest.raises(PlanFileError, match='invalid record'):
+        read_plan(io.BytesIO(fp.getvalue().replace(b'\x002\x00f\x00', b'\x00x\x00f\x00', 1)))
+    with pytest.raises(PlanFileError, match='invalid record'):
+        read_plan(io.BytesIO(fp.getvalue().replace(b'\x002\x00f\x00', b'\x002\x00l\x00', 1)))
+
+
+def test_iter_nul_delimited_reads_in_chunks(monkeypatch):
+    monkeypatch.setattr('src.spasco.planfile.READ_SIZE', 3)
+    assert list(iter_nul_delimited(io.BytesIO(b'ab\0cdefg\0\0h'))) == [b'ab', b'cdefg', b'', b'h']
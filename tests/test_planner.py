@@ -0,0 +1,68 @@
+import pytest
+
+from src.spasco.planner import COLLISION, EXISTS, InvalidNameError, plan_renames
+from src.spasco.walker import PathEntry
+
+
+def entry(path, is_dir=False):
+    return PathEntry(path, path.rpartition('/')[2], path.count('/') + 1, is_dir=is_dir)
+
+
+def underscores(name):
+    return name.replace(' ', '_')
+
+
+def test_targets_and_final_paths_under_renamed_parents():
+    plan = plan_renames([entry('a b/c/d e'), entry('a b/f g', True), entry('a b', True), entry('h')], underscores)
+    assert [(op.src, op.dst) for op in plan] == [('a b/c/d e', 'a b/c/d_e'), ('a b/f g', 'a b/f_g'), ('a b', 'a_b')]
+    assert [plan.final_path(op.src) for op in plan] == ['a_b/c/d_e', 'a_b/f_g', 'a_b']
+    assert plan.final_path('/abs/x y') == '/abs/x y'
+
+
+def test_collisions_are_detected_including_targets_under_renamed_parents():
+    plan = plan_renames([entry('p q/a b'), entry('p q/a-b'), entry('p_q/c d'), entry('p q', True)],
+                        lambda name: name.replace(' ', '_').replace('-', '_'))
+    conflicts = plan.conflicts(check_disk=False)
+    assert conflicts[0].target == 'p_q/a_b'
+    assert conflicts[0].sources == ('p q/a b', 'p q/a-b')
+    assert conflicts[0].reason == COLLISION
+    assert len(conflicts) == 1
+
+
+def test_existing_targets_are_reported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'a b').mkdir()
+    (tmp_path / 'a_b').mkdir()
+    (tmp_path / 'c d').touch()
+    plan = plan_renames([entry('a b', True), entry('c d')], underscores)
+    assert plan.conflicts() == [('a_b', ('a b',), EXISTS)]
+
+
+def test_plan_of_many_entries_is_checked_in_linear_time():
+    entries = [entry(f'd {i}/f {j}') for i in range(300) for j in range(300)]
+    entries += [entry(f'd {i}', True) for i in range(300)]
+    plan = plan_renames(entries, underscores)
+    assert len(plan) == 90300
+    assert plan.conflicts(check_disk=False) == []
+
+
+def test_ops_are_scheduled_deepest_first_in_depth_buckets():
+    plan = plan_renames([entry('a b', True), entry('a b/c d', True), entry('x y'), entry('a b/c d/e f')], underscores)
+    assert [op.src for op in plan] == ['a b/c d/e f', 'a b/c d', 'a b', 'x y']
+    buckets = plan.depth_buckets()
+    assert [depth for depth, _ in buckets] == [3, 2, 1]
+    assert [op.src for op in buckets[2][1]] == ['a b', 'x y']
+
+
+def test_duplicates_are_skipped_and_paths_are_built_on_demand():
+    plan = plan_renames([entry('/abs/a b'), entry('/abs/a b'), entry('x y', True), entry('/abs', True)], underscores)
+    assert len(plan) == 2
+    assert [(op.src, op.dst, op.is_dir) for op in plan] == [('/abs/a b', '/abs/a_b', False), ('x y', 'x_y', True)]
+    assert plan.final_path('/abs/a b') == '/abs/a_b'
+    assert plan.final_path('x y/new') == 'x_y/new'
+
+
+def test_new_names_must_be_valid_file_names():
+    for new_name in ('a/b', '', '.', '..', 'a\0b'):
+        with pytest.raises(InvalidNameError):
+            plan_renames([entry('x y')], lambda name: new_name)
@@ -0,0 +1,57 @@
+import io
+
+from src.spasco.planner import RenamePlan, plan_renames, rename_ops
+from src.spasco.preview import LiveProgress, render_preview
+from src.spasco.walker import PathEntry
+
+
+def make_plan(count):
+    entries = [PathEntry(f'd {i}', f'd {i}', 1, is_dir=i % 2 == 0) for i in range(count)]
+    return plan_renames(entries, lambda name: name.replace(' ', '_'))
+
+
+def test_preview_table():
+    stream = io.StringIO()
+    render_preview(make_plan(2), stream=stream)
+    assert stream.getvalue() == ("2 files/directories can be renamed:\n"
+                                 "before     after\n"
+                                 "'d 0' --> 'd_0'\n"
+                                 "'d 1' --> 'd_1'\n")
+
+
+def test_preview_limit_prints_summary():
+    stream = io.StringIO()
+    render_preview(make_plan(10000), stream=stream, limit=3)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 6
+    assert lines[0] == '10000 files/directories can be renamed:'
+    assert lines[-1] == '... 9997 more not shown (4999 files, 4998 directories)'
+
+
+def test_large_preview_is_written_in_batches():
+    class CountingStream(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    stream = CountingStream()
+    render_preview(make_plan(10000), stream=stream)
+    assert len(stream.getvalue().splitlines()) == 10002
+    assert stream.writes < 10
+
+
+def test_live_progress_streams_ops_while_they_are_found():
+    stream, status = io.StringIO(), io.StringIO()
+    progress = LiveProgress(stream=stream, status=status)
+    names = [f'd {i}' if i % 3 else f'd{i}' for i in range(6)]
+    entries = [PathEntry(name, name, 1) for name in names]
+    ops = progress.show_matched(rename_ops(progress.count_scanned(entries), lambda name: name.replace(' ', '_')))
+    first = next(ops)
+    assert stream.getvalue() == f"{first.src!r} --> {first.dst!r}\n"
+    plan = RenamePlan(ops)
+    progress.close()
+    assert len(plan) == 3  # the first op was taken by next()
+    assert len(stream.getvalue().splitlines()) == 4
+    assert status.getvalue() == 'scanned: 6  matched: 4\n'
@@ -0,0 +1,64 @@
+import os
+
+from src.spasco.references import ReferenceRewriter, _trie_pattern, reference_files
+
+
+def test_longest_renamed_path_is_replaced(tmp_path):
+    makefile = tmp_path / 'Makefile'
+    makefile.write_bytes(b'SRC = a b/c d/x.c a b/e.c\nDOC = ./a b/README data b\nall: a b.txt\n')
+    os.chmod(makefile, 0o640)
+    rewriter = ReferenceRewriter([('a b', 'a_b'), ('a b/c d', 'a_b/c_d'), ('same', 'same')])
+    assert len(rewriter) == 2
+    update = rewriter.rewrite(str(makefile))
+    assert update.replaced == 3 and update.error is None
+    assert makefile.read_bytes() == b'SRC = a_b/c_d/x.c a_b/e.c\nDOC = ./a_b/README data b\nall: a b.txt\n'
+    assert makefile.stat().st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(tmp_path)) == ['Makefile']
+
+
+def test_paths_outside_the_renamed_tree_are_kept(tmp_path):
+    config = tmp_path / 'paths.cfg'
+    config.write_bytes(b'vendor/foo bar/x\n/usr/share/foo bar/x\n../foo bar\n'
+                       b'./foo bar/x\n/home/u/foo bar/x\n(foo bar)\n')
+    rewriter = ReferenceRewriter([('foo bar', 'foo_bar')], base_dir='/home/u/')
+    assert rewriter.rewrite(str(config)).replaced == 3
+    assert config.read_bytes() == (b'vendor/foo bar/x\n/usr/share/foo bar/x\n../foo bar\n'
+                                   b'./foo_bar/x\n/home/u/foo_bar/x\n(foo_bar)\n')
+
+
+def test_files_without_references_are_not_rewritten(tmp_path):
+    unchanged, empty = tmp_path / 'unchanged.cfg', tmp_path / 'empty.cfg'
+    unchanged.write_text('path = a_b\n')
+    empty.touch()
+    mtime_ns = unchanged.stat().st_mtime_ns
+    inode = unchanged.stat().st_ino
+    rewriter = ReferenceRewriter([('a b', 'a_b')])
+    assert [update.replaced for update in rewriter.rewrite_all([str(unchanged), str(empty)])] == [0, 0]
+    assert unchanged.stat().st_ino == inode and unchanged.stat().st_mtime_ns == mtime_ns
+    assert rewriter.rewrite(str(tmp_path / 'missing')).error is not None
+
+
+def test_trie_pattern_prefers_longer_words():
+    import re
+    pattern = re.compile(_trie_pattern([b'ab', b'abc', b'abd', b'x.y']))
+    assert pattern.findall(b'abc abd ab abx x.y xzy') == [b'abc', b'abd', b'ab', b'ab', b'x.y']
+
+
+def test_reference_files(tmp_path, monkeypatch):
+    (tmp_path / 'a b').mkdir()
+    (tmp_path / 'a b' / 'Makefile').touch()
+    (tmp_path / 'Makefile').touch()
+    monkeypatch.chdir(tmp_path)
+    assert sorted(reference_files(['**/Makefile', 'Makefile'])) == ['Makefile', 'a b/Makefile']
+
+
+def test_long_paths(tmp_path):
+    long_dir = '/'.join(['d' * 200] * 5) + '/a b'
+    paths = [(long_dir, long_dir.replace(' ', '_')), (long_dir + '/c d', long_dir.replace(' ', '_') + '/c_d')]
+    paths.append(('x ' * 2000, 'x_' * 2000))
+    config = tmp_path / 'paths.cfg'
+    config.write_text(f'dir = {long_dir}/c d/e\nother = {long_dir}\n')
+    update = ReferenceRewriter(paths).rewrite(str(config))
+    assert update.replaced == 2
+    expected = long_dir.replace(' ', '_')
+    assert config.read_text() == f'dir = {expected}/c_d/e\nother = {expected}\n'
@@ -0,0 +1,54 @@
+import io
+import logging
+import os
+
+from src.spasco.rename_log import BatchingRotatingFileHandler, rename_logging
+
+
+def test_records_are_written_by_the_background_writer(tmp_path):
+    log_file = tmp_path / 'spasco.log'
+    with rename_logging(str(log_file)) as logger:
+        for i in range(10):
+            logger.info(' working dir: %r | naming: %r --> %r', '/cwd', f'a {i}', f'a_{i}')
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 10
+    assert lines[0].startswith('INFO | ')
+    assert lines[0].endswith(" working dir: '/cwd' | naming: 'a 0' --> 'a_0'")
+    assert not logger.isEnabledFor(logging.INFO)
+
+
+def test_log_file_is_rotated_by_size(tmp_path):
+    log_file = tmp_path / 'spasco.log'
+    with rename_logging(str(log_file), max_bytes=1000, backup_count=2) as logger:
+        for i in range(100):
+            logger.info('naming: %r', f'path {i}')
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['spasco.log', 'spasco.log.1', 'spasco.log.2']
+
+
+def test_records_are_dropped_if_logging_is_turned_off(tmp_path):
+    with rename_logging(None) as logger:
+        logger.info('naming: %r', 'x')
+    assert not list(tmp_path.iterdir())
+
+
+def test_records_are_written_in_batches(tmp_path):
+    writes = []
+
+    class CountingFileIO(io.FileIO):
+        def write(self, data):
+            writes.append(len(data))
+            return super().write(data)
+
+    class CountingHandler(BatchingRotatingFileHandler):
+        def _open(self):
+            stream = io.TextIOWrapper(io.BufferedWriter(CountingFileIO(self.baseFilename, 'a')), encoding='utf-8')
+            self._size = os.fstat(stream.fileno()).st_size
+            return stream
+
+    log_file = tmp_path / 'spasco.log'
+    handler = CountingHandler(str(log_file), maxBytes=10 * 1024 * 1024, encoding='utf-8', delay=True)
+    for i in range(1000):
+        handler.handle(logging.makeLogRecord({'msg': f'naming: a {i} --> a_{i}', 'levelno': logging.INFO}))
+    handler.close()
+    assert len(log_file.read_text().splitlines()) == 1000
+    assert len(writes) < 10
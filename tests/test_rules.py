@@ -0,0 +1,62 @@
+import pytest
+
+from src.spasco.rules import RegexRule, RuleSet, compile_pattern, format_rule, parse_rule, parse_rules
+
+
+def test_single_rule_is_a_plain_replacement():
+    rules = RuleSet([(' ', '_')])
+    assert rules('a b c') == 'a_b_c'
+    assert rules.search('a b') and not rules.search('ab')
+
+
+def test_all_rules_are_applied_in_one_pass():
+    rules = RuleSet([(' ', '_'), ('&', 'and'), ('(', ''), (')', ''), ('ä', 'ae')])
+    assert rules('Bär & (Hund)') == 'Baer_and_Hund'
+    # replacements aren't replaced again
+    assert RuleSet([('a', 'b'), ('b', 'a')])('ab') == 'ba'
+
+
+def test_multi_character_rules_take_precedence():
+    rules = RuleSet([(' ', '_'), (' & ', '_and_'), ('&', '+'), ('& &', '')])
+    assert rules('a & b & c') == 'a_and_b_and_c'
+    assert rules('a&b c&&') == 'a+b_c++'
+    assert rules('x& &y') == 'xy'
+    assert rules.search('a&b') and rules.search('a & b') and not rules.search('ab')
+
+
+def test_later_rule_overrides_earlier_one_with_the_same_search_value():
+    rules = RuleSet([(' ', '_'), ('-', '_'), (' ', '-')])
+    assert len(rules) == 2
+    assert rules('a b-c') == 'a-b_c'
+
+
+def test_empty_search_value_is_rejected():
+    with pytest.raises(ValueError):
+        RuleSet([('', '_')])
+    with pytest.raises(ValueError):
+        parse_rule('=_')
+    with pytest.raises(ValueError):
+        parse_rule('no rule')
+
+
+def test_parse_and_format_rules():
+    assert parse_rule('&=and') == ('&', 'and')
+    assert parse_rule("' '=_") == (' ', '_')
+    assert parse_rule('a=b=c') == ('a', 'b=c')
+    assert parse_rules("' & '=_and_\n\n(=\n") == [(' & ', '_and_'), ('(', '')]
+    for rule in [(' ', '_'), ('(', ''), ("'", 'x')]:
+        assert parse_rule(format_rule(rule)) == rule
+
+
+def test_regex_rule_with_backreferences():
+    rule = RegexRule(r'(\d+)-(\d+)', r'\2-\1')
+    assert rule('track 01-02.mp3') == 'track 02-01.mp3'
+    assert rule.search('a1-2') and not rule.search('a1_2')
+    assert RegexRule(r'\s+', '_')('a  b\tc') == 'a_b_c'
+
+
+def test_regex_patterns_are_compiled_once():
+    compile_pattern.cache_clear()
+    RegexRule('[ _]+', '-')
+    RegexRule('[ _]+', '_')
+    assert compile_pattern.cache_info().hits == 1
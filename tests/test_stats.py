@@ -0,0 +1,45 @@
+import io
+import json
+import time
+
+from src.spasco.stats import RunStats, profiled
+
+
+def test_streamed_stages_exclude_their_upstream():
+    stats = RunStats()
+
+    def slow(items):
+        for item in items:
+            time.sleep(0.01)
+            yield item
+
+    walked = stats.iterate('walk', slow(range(5)))
+    filtered = stats.iterate('filter', (item for item in walked if item % 2), upstream='walk')
+    with stats.measure('plan', upstream='filter') as stage:
+        stage.items = len(list(filtered))
+    assert stats.stage('walk').items == 5
+    assert stats.stage('filter').items == stats.stage('plan').items == 2
+    assert stats.stage('walk').seconds >= 0.05
+    assert stats.stage('filter').seconds < 0.01
+    assert stats.stage('plan').seconds < 0.01
+
+
+def test_write_text_and_json():
+    stats = RunStats()
+    with stats.measure('rename') as stage:
+        stage.items_in, stage.items = 3, 2
+    text = io.StringIO()
+    stats.write(text)
+    row = text.getvalue().splitlines()[1].split()
+    assert row[0] == 'rename' and row[2:4] == ['3', '2']
+    out = io.StringIO()
+    stats.write(out, format='json')
+    assert json.loads(out.getvalue())['stages'][0]['items'] == 2
+
+
+def test_profiled_reports():
+    for kind, expected in [('cpu', 'cumulative'), ('memory', 'peak memory')]:
+        stream = io.StringIO()
+        with profiled(kind, stream):
+            sorted(range(1000))
+        assert expected in stream.getvalue()
@@ -0,0 +1,31 @@
+import os
+
+from src.spasco.symlinks import SymlinkRetargeter
+
+
+def test_new_path_resolves_renamed_parents():
+    retargeter = SymlinkRetargeter([('/t/a b', '/t/a_b'), ('/t/a b/c d', '/t/a b/c_d'), ('/t/x', '/t/x')])
+    assert len(retargeter) == 2
+    assert retargeter.new_path('/t/a b/c d/e') == '/t/a b/c_d/e'
+    assert retargeter.new_path('/t/a b/f') == '/t/a_b/f'
+    assert retargeter.new_path('/t/a bc') is None
+    assert retargeter.new_path('/t') is None
+
+
+def test_relative_and_absolute_links_are_recreated(tmp_path):
+    (tmp_path / 'new dir' / 'sub').mkdir(parents=True)
+    (tmp_path / 'links').mkdir()
+    (tmp_path / 'links' / 'rel').symlink_to(os.path.join('..', 'new dir', 'sub'))
+    (tmp_path / 'links' / 'abs').symlink_to(tmp_path / 'new dir')
+    (tmp_path / 'links' / 'other').symlink_to('elsewhere')
+    os.rename(tmp_path / 'new dir', tmp_path / 'new_dir')
+    retargeter = SymlinkRetargeter([(str(tmp_path / 'new dir'), str(tmp_path / 'new_dir'))])
+    links = [str(tmp_path / 'links' / name) for name in ('rel', 'abs', 'other')]
+    results = list(retargeter.retarget_all((link, link) for link in links))
+    assert [(os.path.basename(r.path), r.new_target, r.error) for r in results] == [
+        ('rel', os.path.join('..', 'new_dir', 'sub'), None),
+        ('abs', str(tmp_path / 'new_dir'), None),
+    ]
+    assert (tmp_path / 'links' / 'rel').resolve() == (tmp_path / 'new_dir' / 'sub')
+    assert os.readlink(tmp_path / 'links' / 'other') == 'elsewhere'
+    assert sorted(os.listdir(tmp_path / 'links')) == ['abs', 'other', 'rel']
@@ -0,0 +1,121 @@
+import os
+
+from src.spasco import walker
+from src.spasco.matcher import GlobMatcher
+from src.spasco.walker import PathEntry, walk, walk_roots
+
+
+def make_tree(base):
+    (base / 'a b' / 'c d').mkdir(parents=True)
+    (base / 'a b' / 'c d' / 'e f').touch()
+    (base / 'x y').touch()
+
+
+def test_walk_yields_relative_paths_with_depth_and_type(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    entries = {entry.path: entry for entry in walk()}
+    assert set(entries) == {'a b', 'a b/c d', 'a b/c d/e f', 'x y'}
+    assert entries['a b/c d/e f'].depth == 3
+    assert entries['a b/c d/e f'].name == 'e f'
+    assert entries['a b/c d'].is_dir and not entries['a b/c d'].is_file
+    assert entries['x y'].is_file and not entries['x y'].is_dir
+
+
+def test_walk_is_lazy_and_lists_parents_first(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    walker = walk()
+    assert next(walker).depth == 1
+    paths = [entry.path for entry in walk()]
+    assert paths.index('a b') < paths.index('a b/c d') < paths.index('a b/c d/e f')
+
+
+def test_walk_does_not_follow_symlinked_dirs(tmp_path):
+    make_tree(tmp_path)
+    (tmp_path / 'link').symlink_to(tmp_path / 'a b')
+    paths = [entry.path for entry in walk(str(tmp_path))]
+    assert str(tmp_path / 'link') in paths
+    assert not any(path.startswith(str(tmp_path / 'link') + '/') for path in paths)
+
+
+def test_path_entry_from_path(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    entry = PathEntry.from_path('a b/c d/')
+    assert (entry.path, entry.name, entry.depth) == ('a b/c d', 'c d', 2)
+    assert entry.is_dir and not entry.is_symlink
+    missing = PathEntry.from_path('missing')
+    assert not (missing.is_dir or missing.is_file)
+
+
+def test_walk_prunes_subtrees_without_opening_them(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    (tmp_path / '.git' / 'objects').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    opened = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: opened.append(path) or scandir(path))
+    paths = [entry.path for entry in walk(prune=GlobMatcher(['.git', 'c*']))]
+    assert sorted(paths) == ['a b', 'x y']
+    assert sorted(opened) == ['.', 'a b']
+
+
+def test_walk_max_depth(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    assert sorted(entry.path for entry in walk(max_depth=1)) == ['a b', 'x y']
+    assert max(entry.depth for entry in walk(max_depth=2)) == 2
+
+
+def test_walk_one_file_system_keeps_same_device(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    paths = [entry.path for entry in walk(one_file_system=True)]
+    assert 'a b/c d/e f' in paths
+
+
+def make_wide_tree(base, width=6):
+    for i in range(width):
+        for j in range(width):
+            (base / f'd {i}' / f's {j}').mkdir(parents=True)
+            (base / f'd {i}' / f's {j}' / 'f x').touch()
+
+
+def test_parallel_walk_yields_the_same_entries_as_serial_walk(tmp_path, monkeypatch):
+    make_wide_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    serial = sorted((entry.path, entry.depth) for entry in walk())
+    parallel = [(entry.path, entry.depth) for entry in walk(jobs=4)]
+    assert sorted(parallel) == serial
+    assert parallel == [(entry.path, entry.depth) for entry in walk(jobs=4)]
+    assert sorted((e.path, e.depth) for e in walk(jobs=64, max_depth=2)) == [x for x in serial if x[1] <= 2]
+
+
+def test_walk_roots_includes_the_roots(tmp_path, monkeypatch):
+    make_wide_tree(tmp_path, width=2)
+    monkeypatch.chdir(tmp_path)
+    paths = [entry.path for entry in walk_roots(['d 0', 'd 1/s 1'], max_depth=1, jobs=2)]
+    assert sorted(paths) == ['d 0', 'd 0/s 0', 'd 0/s 1', 'd 1/s 1', 'd 1/s 1/f x']
+
+
+def test_parallel_walk_streams_with_bounded_buffers(tmp_path, monkeypatch):
+    for root in range(4):
+        for i in range(500):
+            os.makedirs(tmp_path / f'r{root}' / f'd{i}')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(walker, '_CHUNK_ENTRIES', 16)
+    scanned = []
+
+    def prune(name):
+        scanned.append(name)
+        return False
+
+    entries = walk(prune=prune, jobs=2)
+    paths = [next(entries).path for _ in range(6)]
+    assert sorted(paths[:4]) == ['r0', 'r1', 'r2', 'r3']
+    assert all(path.startswith(paths[0] + '/d') for path in paths[4:])
+    # the workers stop when their queues are full instead of walking the whole tree
+    assert len(scanned) < 1000
+    entries.close()
+    assert sum(1 for _ in walk(jobs=2)) == 4 + 4 * 500
@@ -0,0 +1,41 @@
+import os
+
+from src.spasco.matcher import GlobMatcher
+from src.spasco.watcher import Watcher
+
+
+def test_new_and_moved_in_entries_are_batched(tmp_path, monkeypatch):
+    (tmp_path / 'w').mkdir()
+    (tmp_path / 'outside').touch()
+    monkeypatch.chdir(tmp_path)
+    with Watcher(['w'], window=0.01) as watcher:
+        (tmp_path / 'w' / 'a b').touch()
+        os.rename(tmp_path / 'outside', tmp_path / 'w' / 'c d')
+        batch = next(watcher.batches())
+    assert sorted((entry.path, entry.depth, entry.is_file) for entry in batch) == [
+        ('w/a b', 2, True), ('w/c d', 2, True)]
+
+
+def test_recursive_watch_includes_content_of_new_dirs(tmp_path, monkeypatch):
+    (tmp_path / 'w' / 'old').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / 'w')
+    with Watcher(['.'], recursive=True, prune=GlobMatcher(['skip*']), window=0.01) as watcher:
+        (tmp_path / 'w' / 'new' / 'sub').mkdir(parents=True)
+        (tmp_path / 'w' / 'new' / 'sub' / 'f').touch()
+        (tmp_path / 'w' / 'old' / 'g').touch()
+        (tmp_path / 'w' / 'skipped').mkdir()
+        batch = next(watcher.batches())
+    assert sorted(entry.path for entry in batch) == ['new', 'new/sub', 'new/sub/f', 'old/g']
+
+
+def test_own_renamings_are_skipped_and_tracked(tmp_path, monkeypatch):
+    (tmp_path / 'w').mkdir()
+    monkeypatch.chdir(tmp_path)
+    with Watcher(['w'], recursive=True, window=0.01) as watcher:
+        batches = watcher.batches()
+        (tmp_path / 'w' / 'a b').mkdir()
+        assert [entry.path for entry in next(batches)] == ['w/a b']
+        os.rename('w/a b', 'w/a_b')
+        watcher.renamed('w/a b', 'w/a_b', is_dir=True)
+        (tmp_path / 'w' / 'a_b' / 'x y').touch()
+        assert [entry.path for entry in next(batches)] == ['w/a_b/x y']